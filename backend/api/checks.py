@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии кешей должны быть видны всем процессам (см. CACHES)."""
+    if settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Warning(
+        "The default cache is local to each process.",
+        hint=(
+            "Cache versions bumped by the image worker and by load_data, "
+            "import_recipes and generate_data never reach the web "
+            "processes, so they serve stale responses. Set CACHE_BACKEND "
+            "to a shared backend such as RedisCache."
+        ),
+        id="api.W001",
+    )]
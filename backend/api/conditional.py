@@ -0,0 +1,111 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from recipes import shopping_list
+from recipes.catalog import ingredient_catalog
+from recipes.models import Recipe
+from recipes.relations import relations_version
+
+from .response_cache import content_generation
+
+
+def make_etag(*parts):
+    key = "|".join(str(part) for part in parts)
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def conditional(etag_func, last_modified_func=None):
+    """Условный GET для действия вьюсета.
+
+    Валидаторы считаются до вызова действия, и при совпадении
+    If-None-Match / If-Modified-Since сразу возвращается 304 — без
+    запросов за данными и сериализации. Ответ помечается no-cache:
+    клиент хранит его, но перед каждым использованием перепроверяет.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = etag_func(request, *args, **kwargs)
+            last_modified = None
+            if last_modified_func is not None:
+                last_modified = last_modified_func(request, *args, **kwargs)
+            timestamp = (
+                int(last_modified.timestamp()) if last_modified else None
+            )
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if etag:
+                response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+            patch_cache_control(response, no_cache=True)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _variant(request):
+    """От чего ещё зависит тело ответа: адрес, формат и зритель."""
+    return (
+        request.get_full_path(),
+        request.META.get("HTTP_ACCEPT", ""),
+        relations_version(request.user),
+    )
+
+
+def recipe_list_etag(request, *args, **kwargs):
+    return make_etag("recipes", content_generation(), *_variant(request))
+
+
+def _recipe_updated_at(request, pk):
+    if not str(pk).isdigit():
+        return None
+    versions = getattr(request, "_recipe_versions", None)
+    if versions is None:
+        versions = request._recipe_versions = {}
+    if pk not in versions:
+        versions[pk] = Recipe.objects.filter(pk=pk).values_list(
+            "updated_at", flat=True
+        ).first()
+    return versions[pk]
+
+
+def recipe_etag(request, pk=None, **kwargs):
+    updated_at = _recipe_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return make_etag(
+        "recipe", pk, updated_at.isoformat(), ingredient_catalog.version,
+        *_variant(request),
+    )
+
+
+def recipe_last_modified(request, pk=None, **kwargs):
+    # Для пользователя в ответе ещё и его флаги, которых дата изменения
+    # рецепта не отражает, поэтому ему валидатор только ETag.
+    if request.user.is_authenticated:
+        return None
+    return _recipe_updated_at(request, pk)
+
+
+def ingredients_etag(request, *args, **kwargs):
+    return make_etag(
+        "ingredients", ingredient_catalog.version,
+        request.get_full_path(), request.META.get("HTTP_ACCEPT", ""),
+    )
+
+
+def shopping_list_etag(request, *args, **kwargs):
+    return make_etag(
+        "shopping_list", request.accepted_renderer.format,
+        shopping_list.version(request.user.pk), ingredient_catalog.version,
+    )
@@ -0,0 +1,269 @@
+import base64
+import binascii
+import math
+import os
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from foodgram.constants import (IMAGE_JPEG_QUALITY, IMAGE_MAX_PIXELS,
+                                IMAGE_MAX_SIDE, IMAGE_UPLOAD_MAX_SIZE)
+from PIL import Image, UnidentifiedImageError
+from recipes import image_variants
+from rest_framework import serializers
+from rest_framework.parsers import DataAndFiles, FileUploadParser
+
+from . import profiling
+
+# Форматы, которые принимаются, и расширения сохраняемых файлов.
+FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+# Кратно 4: каждый кусок base64 декодируется независимо.
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_MARKER = ";base64,"
+EXIF_ORIENTATION = 0x0112
+# Поворот по тегу Orientation, как в ImageOps.exif_transpose.
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+# Высота полосы итоговой картинки при уменьшении по частям.
+RESIZE_BAND_HEIGHT = 128
+
+
+class ImageRejected(Exception):
+    """Картинка не прошла проверку; args[0] — код ошибки поля."""
+
+
+def _temporary_file(name="upload"):
+    """Файл в памяти до FILE_UPLOAD_MAX_MEMORY_SIZE, дальше на диске."""
+    return UploadedFile(
+        SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE),
+        name=name,
+    )
+
+
+def _finish(upload, content_type=None):
+    upload.size = upload.seek(0, os.SEEK_END)
+    upload.content_type = content_type
+    upload.seek(0)
+    return upload
+
+
+def decode_base64(data):
+    """Декодирует base64 или data URI во временный файл по частям.
+
+    Размер проверяется по длине строки до декодирования, а в памяти
+    одновременно держится только один кусок результата.
+    """
+    start = data.find(BASE64_MARKER)
+    start = 0 if start == -1 else start + len(BASE64_MARKER)
+    if (len(data) - start) * 3 // 4 > IMAGE_UPLOAD_MAX_SIZE:
+        raise ImageRejected("too_large")
+    upload = _temporary_file()
+    try:
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            upload.write(base64.b64decode(
+                data[position:position + BASE64_CHUNK_SIZE], validate=True
+            ))
+    except (binascii.Error, ValueError):
+        upload.close()
+        raise ImageRejected("invalid")
+    return _finish(upload)
+
+
+def _shrink(image, size):
+    """Уменьшает картинку до size полосами по RESIZE_BAND_HEIGHT строк.
+
+    Image.resize и thumbnail сначала сжимают картинку по ширине
+    в промежуточную копию почти исходной высоты, и она занимает
+    больше памяти, чем результат. Полосы берут из исходника ту же
+    область (box), что и целый resize, поэтому швов нет.
+    """
+    if image.mode in ("1", "P"):
+        # Палитра не переносится при вставке, а такие картинки
+        # занимают байт на пиксель: уменьшаем целиком.
+        return image.resize(size)
+    width, height = size
+    scale = image.height / height
+    result = Image.new(image.mode, size)
+    for top in range(0, height, RESIZE_BAND_HEIGHT):
+        bottom = min(top + RESIZE_BAND_HEIGHT, height)
+        band = image.resize(
+            (width, bottom - top), Image.Resampling.BICUBIC,
+            box=(0, top * scale, image.width, bottom * scale),
+        )
+        result.paste(band, (0, top))
+        band.close()
+    return result
+
+
+def ingest(upload):
+    """Проверяет картинку по заголовку и уменьшает её до IMAGE_MAX_SIDE.
+
+    Image.open читает только заголовок, поэтому слишком большие по
+    числу пикселей картинки (decompression bomb) отклоняются до
+    распаковки. Картинка в пределах лимитов сохраняется как есть,
+    без перекодирования; иначе уменьшается во временный файл: JPEG
+    распаковывается сразу в уменьшенном масштабе (draft), уменьшение
+    идёт полосами, а поворот по EXIF — уже на уменьшенной картинке.
+    """
+    if upload.size > IMAGE_UPLOAD_MAX_SIZE:
+        raise ImageRejected("too_large")
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise ImageRejected("too_many_pixels")
+    except (UnidentifiedImageError, OSError):
+        raise ImageRejected("invalid_image")
+    if image.format not in FORMATS:
+        raise ImageRejected("invalid_image")
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageRejected("too_many_pixels")
+
+    image_format = image.format
+    name = f"{uuid.uuid4().hex}.{FORMATS[image_format]}"
+    transpose = ORIENTATION_TRANSPOSE.get(
+        image.getexif().get(EXIF_ORIENTATION)
+    )
+    if max(width, height) <= IMAGE_MAX_SIDE and transpose is None:
+        # verify() работает только сразу после open, а getexif() уже
+        # прочитал часть файла.
+        upload.seek(0)
+        try:
+            Image.open(upload).verify()
+        except Exception:
+            raise ImageRejected("invalid_image")
+        upload.name = name
+        upload.content_type = Image.MIME[image_format]
+        upload.seek(0)
+        return upload
+
+    scale = min(IMAGE_MAX_SIDE / max(width, height), 1)
+    size = (max(round(width * scale), 1), max(round(height * scale), 1))
+    result = image
+    try:
+        if image_format == "JPEG":
+            # Декодер JPEG умеет сразу уменьшать в 2, 4 или 8 раз:
+            # просим размер не меньше итогового, чтобы не терять качество.
+            image.draft(
+                "RGB", (math.ceil(width * scale), math.ceil(height * scale))
+            )
+        if image.size != size:
+            # Исходник больше не нужен: освобождаем его до поворота
+            # и сжатия результата.
+            result = _shrink(image, size)
+            image.close()
+        if transpose is not None:
+            rotated = result.transpose(transpose)
+            result.close()
+            result = rotated
+        resized = _temporary_file(name)
+        options = {"optimize": True}
+        if image_format == "JPEG":
+            options["quality"] = IMAGE_JPEG_QUALITY
+        result.save(resized, format=image_format, **options)
+    except (OSError, ValueError):
+        raise ImageRejected("invalid_image")
+    finally:
+        image.close()
+        result.close()
+    return _finish(resized, Image.MIME[image_format])
+
+
+class ImageUploadField(serializers.ImageField):
+    """Картинка из multipart, из тела запроса или из base64-строки."""
+
+    default_error_messages = {
+        "invalid": "Загрузите файл или строку base64 с картинкой.",
+        "invalid_image": (
+            "Загрузите картинку в формате JPEG, PNG, GIF или WEBP."
+        ),
+        "too_large": (
+            "Картинка больше "
+            f"{IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ."
+        ),
+        "too_many_pixels": "Слишком большое разрешение картинки.",
+    }
+
+    def to_internal_value(self, data):
+        try:
+            with profiling.timed("image"):
+                if isinstance(data, str):
+                    data = decode_base64(data)
+                elif not isinstance(data, UploadedFile):
+                    self.fail("invalid")
+                data = ingest(data)
+        except ImageRejected as error:
+            self.fail(error.args[0])
+        # Картинка уже проверена в ingest; ImageField.to_internal_value
+        # прочитал бы файл в память целиком ради повторной проверки.
+        return serializers.FileField.to_internal_value(self, data)
+
+
+class ImageVariantsField(serializers.Field):
+    """URL уменьшенных копий картинки и заглушка-placeholder.
+
+    Пока process_image_jobs не подготовил варианты текущей картинки,
+    все размеры указывают на оригинал, а placeholder равен None.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def _url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image:
+            return None
+        variants = image_variants.current_variants(
+            instance, self.image_field
+        )
+        names = image_variants.variant_names(
+            image_variants.target_of(instance, self.image_field)
+        )
+        if variants is None:
+            original = self._url(image.name)
+            return {
+                **{name: original for name in names}, "placeholder": None
+            }
+        return {
+            **{name: self._url(variants[name]) for name in names},
+            "placeholder": variants["placeholder"],
+        }
+
+
+class RawImageParser(FileUploadParser):
+    """Тело запроса — сама картинка с Content-Type image/*.
+
+    Файл попадает в request.data под именем из атрибута вьюсета
+    raw_image_field. Загрузка идёт через обработчики Django: крупный
+    файл пишется на диск, а не копится в памяти.
+    """
+
+    media_type = "image/*"
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(
+            stream, media_type, parser_context
+        ) or "upload"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        upload = super().parse(stream, media_type, parser_context)
+        field = getattr(parser_context["view"], "raw_image_field", "file")
+        return DataAndFiles({}, {field: upload.files["file"]})
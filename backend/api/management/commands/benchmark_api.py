@@ -0,0 +1,238 @@
+import json
+import math
+import platform
+import random
+import statistics
+import threading
+import time
+from functools import lru_cache
+from itertools import accumulate
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.utils import timezone
+from recipes import short_links
+from recipes.models import Recipe, ShoppingCart
+from rest_framework.authtoken.models import Token
+
+from api.query_budget import QueryCounter
+
+User = get_user_model()
+
+SEARCH_WORDS = ("суп", "салат", "пирог", "рагу", "борщ", "соус")
+INGREDIENT_PREFIXES = ("а", "мол", "сах", "кар", "лу", "со", "ябл")
+
+
+@lru_cache
+def _zipf_weights(count):
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+def zipf_choice(rng, items):
+    """Элемент по закону Ципфа: первые элементы запрашиваются чаще."""
+    return rng.choices(items, cum_weights=_zipf_weights(len(items)))[0]
+
+
+class Dataset:
+    """Что есть в базе: из этого строятся адреса запросов."""
+
+    def __init__(self):
+        self.recipe_ids = list(
+            Recipe.objects.order_by("-favorites_count", "pk")
+            .values_list("pk", flat=True)[:10000]
+        )
+        self.authors = list(
+            User.objects.order_by("-recipes_count", "pk")
+            .values_list("pk", flat=True)[:1000]
+        )
+        # Пользователь с самой большой корзиной: худший случай
+        # для списка покупок.
+        busiest = (
+            ShoppingCart.objects.values("user").annotate(total=Count("pk"))
+            .order_by("-total", "user").first()
+        )
+        if not self.recipe_ids or busiest is None:
+            raise CommandError(
+                "The database has no recipes or carts: run generate_data."
+            )
+        self.user = User.objects.get(pk=busiest["user"])
+        self.token = Token.objects.get_or_create(user=self.user)[0].key
+        self.pages = max(1, min(len(self.recipe_ids) // 6, 50))
+
+    def counts(self):
+        return {
+            "users": User.objects.count(),
+            "recipes": Recipe.objects.count(),
+            "cart_of_benchmark_user": ShoppingCart.objects.filter(
+                user=self.user
+            ).count(),
+        }
+
+
+# Сценарий: (нужен ли токен, адрес запроса по генератору и данным).
+SCENARIOS = {
+    "recipes_anon": (False, lambda rng, data: (
+        f"/api/recipes/?page={zipf_choice(rng, range(1, data.pages + 1))}"
+    )),
+    "recipes_auth": (True, lambda rng, data: (
+        f"/api/recipes/?page={zipf_choice(rng, range(1, data.pages + 1))}"
+    )),
+    "recipes_favorited": (True, lambda rng, data: (
+        "/api/recipes/?is_favorited=1"
+    )),
+    "recipes_author": (False, lambda rng, data: (
+        f"/api/recipes/?author={zipf_choice(rng, data.authors)}"
+    )),
+    "recipes_search": (False, lambda rng, data: (
+        f"/api/recipes/?search={rng.choice(SEARCH_WORDS)}"
+    )),
+    "recipe_detail": (True, lambda rng, data: (
+        f"/api/recipes/{zipf_choice(rng, data.recipe_ids)}/"
+    )),
+    "ingredients": (False, lambda rng, data: (
+        f"/api/ingredients/?name={rng.choice(INGREDIENT_PREFIXES)}"
+    )),
+    "subscriptions": (True, lambda rng, data: (
+        "/api/users/subscriptions/?recipes_limit=3"
+    )),
+    "download_shopping_cart": (True, lambda rng, data: (
+        "/api/recipes/download_shopping_cart/"
+    )),
+    "short_link": (False, lambda rng, data: (
+        f"/s/{short_links.encode(zipf_choice(rng, data.recipe_ids))}/"
+    )),
+}
+
+
+def percentile(sorted_values, share):
+    """Процентиль по ближайшему рангу."""
+    return sorted_values[max(math.ceil(share * len(sorted_values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the main API endpoints in-process through the Django "
+        "test client, with concurrent threads, and report latency "
+        "percentiles, queries per request and throughput as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios", nargs="+", choices=SCENARIOS,
+            default=list(SCENARIOS),
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--output", help="Write the JSON report to this file",
+        )
+
+    def worker(self, urls, headers, results):
+        client = Client(SERVER_NAME=settings.ALLOWED_HOSTS[0], **headers)
+        counter = QueryCounter()
+        try:
+            with connection.execute_wrapper(counter):
+                for url in urls:
+                    before = counter.count
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                    elapsed = time.perf_counter() - started
+                    results.append((
+                        elapsed, counter.count - before,
+                        response.status_code >= 400,
+                    ))
+        finally:
+            connection.close()
+
+    def run(self, urls, headers, concurrency):
+        results = []
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(urls[index::concurrency], headers, results),
+            )
+            for index in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def measure(self, name, data, kwargs):
+        needs_token, make_url = SCENARIOS[name]
+        rng = random.Random(f"{kwargs['seed']}:{name}")
+        headers = (
+            {"HTTP_AUTHORIZATION": f"Token {data.token}"}
+            if needs_token else {}
+        )
+        urls = [make_url(rng, data) for _ in range(kwargs["requests"])]
+        warmup = [make_url(rng, data) for _ in range(kwargs["warmup"])]
+        self.run(warmup, headers, 1)
+        results, elapsed = self.run(urls, headers, kwargs["concurrency"])
+        latencies = sorted(result[0] * 1000 for result in results)
+        return {
+            "requests": len(results),
+            "errors": sum(result[2] for result in results),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "mean_ms": round(statistics.fmean(latencies), 2),
+            "max_ms": round(latencies[-1], 2),
+            "queries_per_request": round(
+                statistics.fmean(result[1] for result in results), 2
+            ),
+            "throughput_rps": round(len(results) / elapsed, 1),
+        }
+
+    def handle(self, *args, **kwargs):
+        if kwargs["requests"] < 1 or kwargs["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be >= 1")
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING(
+                "DEBUG is on: every query is kept in memory and error "
+                "pages are rendered in full; numbers will be pessimistic."
+            ))
+        data = Dataset()
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "debug": settings.DEBUG,
+                "requests": kwargs["requests"],
+                "concurrency": kwargs["concurrency"],
+                "warmup": kwargs["warmup"],
+                "seed": kwargs["seed"],
+                "dataset": data.counts(),
+            },
+            "scenarios": {},
+        }
+        for name in kwargs["scenarios"]:
+            report["scenarios"][name] = result = self.measure(
+                name, data, kwargs
+            )
+            self.stderr.write(
+                f"{name:<24}p50 {result['p50_ms']:>8.1f}  "
+                f"p99 {result['p99_ms']:>8.1f} ms  "
+                f"{result['queries_per_request']:>6.1f} q/req  "
+                f"{result['throughput_rps']:>8.1f} req/s"
+            )
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if kwargs["output"]:
+            with open(kwargs["output"], "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,92 @@
+import base64
+import io
+import multiprocessing
+import time
+
+from api.images import ImageUploadField
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+
+
+def _status(field):
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1]) // 1024
+    raise KeyError(field)
+
+
+def _run(func, queue):
+    # Сбрасываем пик RSS (VmHWM) процесса, чтобы измерить только func.
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+    baseline = _status("VmRSS")
+    started = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - started) * 1000
+    image = Image.open(result)
+    queue.put((_status("VmHWM") - baseline, elapsed, image.size, result.size))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure peak memory of one image upload per ingestion path. Each "
+        "path runs in a forked process; Linux only (/proc/self/status)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, default=6000)
+        parser.add_argument("--height", type=int, default=4000)
+
+    def _measure(self, label, func):
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        process = context.Process(target=_run, args=(func, queue))
+        process.start()
+        process.join()
+        if process.exitcode:
+            raise CommandError(f"{label}: process failed")
+        peak, elapsed, size, stored = queue.get()
+        self.stdout.write(
+            f"{label:<24}{peak:>10}{elapsed:>10.0f}"
+            f"{f'{size[0]}x{size[1]}':>14}{stored // 1024:>12}"
+        )
+
+    def handle(self, *args, **kwargs):
+        size = (kwargs["width"], kwargs["height"])
+        buffer = io.BytesIO()
+        Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 100).convert(
+            "RGB"
+        ).save(buffer, "JPEG", quality=90)
+        content = buffer.getvalue()
+        encoded = "data:image/jpeg;base64," + base64.b64encode(
+            content
+        ).decode()
+        self.stdout.write(
+            f"Source: {size[0]}x{size[1]} JPEG, {len(content) // 1024} KB, "
+            f"base64 {len(encoded) // 1024} KB"
+        )
+
+        def multipart():
+            # Так Django сохраняет крупный файл из multipart: на диск.
+            upload = TemporaryUploadedFile(
+                "upload.jpg", "image/jpeg", len(content), None
+            )
+            upload.write(content)
+            return ImageUploadField().to_internal_value(upload)
+
+        self.stdout.write(
+            f"{'path':<24}{'peak, MB':>10}{'ms':>10}{'stored':>14}"
+            f"{'KB':>12}"
+        )
+        self._measure(
+            "Base64ImageField",
+            lambda: Base64ImageField().to_internal_value(encoded),
+        )
+        self._measure(
+            "ImageUploadField base64",
+            lambda: ImageUploadField().to_internal_value(encoded),
+        )
+        self._measure("ImageUploadField file", multipart)
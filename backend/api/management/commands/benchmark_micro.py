@@ -0,0 +1,392 @@
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Prefetch, Value
+from django.utils import timezone
+from recipes import shopping_list, short_links, units
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from recipes.relations import build_relations
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import Subscription
+
+from api.query_budget import QueryCounter
+from api.recipes.filters import RecipeFilter
+from api.recipes.serializers import RecipeSerializer
+from api.recipes.shopping_list import (CSVShoppingListRenderer,
+                                       TextShoppingListRenderer,
+                                       shopping_list_queryset)
+from api.recipes.views import SHOPPING_LIST_CHUNK_SIZE, RecipeViewSet
+from api.users.serializers import SubscriptionSerializer
+from api.users.views import latest_recipes
+
+User = get_user_model()
+
+BASELINE = settings.BASE_DIR / "data" / "micro_benchmarks.json"
+PREFIX = "benchmark_micro"
+AUTHORS = 200
+RECIPES_PER_AUTHOR = 5
+INGREDIENTS_PER_RECIPE = 8
+CART_SIZE = 100
+SHORT_LINKS = 10000
+# Минимальная длительность одного замера, секунды.
+MIN_SAMPLE = 0.05
+
+
+class Fixture:
+    """Синтетические данные кейсов; создаются внутри отменяемой транзакции.
+
+    Всё строится от seed и не зависит от остального содержимого базы,
+    кроме справочника ингредиентов.
+    """
+
+    def __init__(self, rng):
+        ingredients = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+            [:500]
+        )
+        if len(ingredients) < INGREDIENTS_PER_RECIPE:
+            raise CommandError("Load ingredients first (load_data).")
+        self.viewer = User.objects.create(
+            username=f"{PREFIX}_viewer",
+            email=f"{PREFIX}_viewer@example.com",
+        )
+        User.objects.bulk_create(
+            User(
+                username=f"{PREFIX}_{index}",
+                email=f"{PREFIX}_{index}@example.com",
+                first_name="Имя",
+                last_name="Фамилия",
+                recipes_count=RECIPES_PER_AUTHOR,
+            )
+            for index in range(AUTHORS)
+        )
+        self.author_ids = list(
+            User.objects.filter(username__startswith=f"{PREFIX}_")
+            .exclude(pk=self.viewer.pk).order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author_id=author_id,
+                name=f"Benchmark {author_id}-{index}",
+                text="Benchmark",
+                cooking_time=rng.randint(5, 180),
+                image="recipes/images/борщ.jpg",
+            )
+            for author_id in self.author_ids
+            for index in range(RECIPES_PER_AUTHOR)
+        )
+        self.recipe_ids = list(
+            Recipe.objects.filter(author_id__in=self.author_ids)
+            .order_by("pk").values_list("pk", flat=True)
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe_id, ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in self.recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredients, INGREDIENTS_PER_RECIPE
+                )
+            ),
+            batch_size=5000,
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=self.viewer, recipe_id=recipe_id)
+            for recipe_id in self.recipe_ids[::3]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=self.viewer, recipe_id=recipe_id)
+            for recipe_id in rng.sample(self.recipe_ids, CART_SIZE)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=self.viewer, author_id=author_id)
+            for author_id in self.author_ids
+        )
+        shopping_list.rebuild([self.viewer.pk])
+        self.relations = build_relations(self.viewer.pk)
+        self.factory = APIRequestFactory()
+
+    def request(self, path="/api/recipes/", **params):
+        """Запрос от имени зрителя со снимком связей без кеша.
+
+        Снимок подставляется заранее: кеш пережил бы откат транзакции,
+        а его чтение не относится к измеряемому коду.
+        """
+        request = Request(self.factory.get(
+            path, params, SERVER_NAME=settings.ALLOWED_HOSTS[0]
+        ))
+        request.user = self.viewer
+        request._relations = self.relations
+        return request
+
+    def recipe_queryset(self):
+        return Recipe.objects.filter(author_id__in=self.author_ids)
+
+
+def recipe_serializer(fixture):
+    recipes = list(
+        fixture.recipe_queryset().select_related("author")
+        .prefetch_related("recipeingredients").order_by("pk")
+    )
+    return lambda: RecipeSerializer(
+        recipes, many=True, context={"request": fixture.request()}
+    ).data
+
+
+def subscription_serializer(fixture):
+    request = fixture.request("/api/users/subscriptions/", recipes_limit="3")
+    authors = list(
+        User.objects.filter(authors__subscriber=fixture.viewer)
+        .annotate(is_subscribed=Value(True))
+        .prefetch_related(Prefetch(
+            "recipes", queryset=latest_recipes("3"), to_attr="latest_recipes",
+        ))
+        .order_by("username")
+    )
+    return lambda: SubscriptionSerializer(
+        authors, many=True, context={"request": request}
+    ).data
+
+
+def filter_boolean_field(name, value):
+    def setup(fixture):
+        request = fixture.request()
+        queryset = fixture.recipe_queryset()
+
+        def run():
+            recipe_filter = RecipeFilter(
+                data={}, queryset=queryset, request=request
+            )
+            return list(
+                recipe_filter.filter_boolean_field(queryset, name, value)
+                .values_list("pk", flat=True)
+            )
+        return run
+    return setup
+
+
+def shopping_list_aggregate(fixture):
+    return lambda: list(units.aggregate(
+        shopping_list_queryset(fixture.viewer).iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE
+        )
+    ))
+
+
+def format_shopping_list(renderer_class):
+    def setup(fixture):
+        view = RecipeViewSet()
+        return lambda: b"".join(
+            chunk if isinstance(chunk, bytes) else chunk.encode()
+            for chunk in view._format_shopping_list(
+                renderer_class(), fixture.viewer
+            )
+        )
+    return setup
+
+
+def short_link_encode(fixture):
+    # Бывший Recipe.generate_link: код теперь выводится из id.
+    pks = range(1, SHORT_LINKS + 1)
+    return lambda: [short_links.encode(pk) for pk in pks]
+
+
+# Кейс: подготовка по данным -> измеряемая функция без аргументов.
+CASES = {
+    "recipe_serializer": recipe_serializer,
+    "subscription_serializer": subscription_serializer,
+    "filter_favorited": filter_boolean_field("is_favorited", True),
+    "filter_not_in_cart": filter_boolean_field("is_in_shopping_cart", False),
+    "shopping_list_aggregate": shopping_list_aggregate,
+    "format_shopping_list_txt": format_shopping_list(
+        TextShoppingListRenderer
+    ),
+    "format_shopping_list_csv": format_shopping_list(CSVShoppingListRenderer),
+    "short_link_encode": short_link_encode,
+}
+
+
+def environment():
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark serializers, recipe filters, shopping list "
+        "aggregation and short link encoding on a synthetic dataset "
+        "(rolled back afterwards) and compare the results with the "
+        "committed baseline. Fails when a case is slower than the "
+        "threshold allows or runs more queries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cases", nargs="+", choices=CASES, default=list(CASES),
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--threshold", type=float, default=0.25,
+            help="Allowed slowdown against the baseline, 0.25 = 25%%",
+        )
+        parser.add_argument(
+            "--baseline", default=str(BASELINE),
+            help="Baseline JSON file",
+        )
+        parser.add_argument(
+            "--update-baseline", action="store_true",
+            help="Write this run's results to the baseline file",
+        )
+
+    def _measure(self, func, repeat):
+        """Лучшее и медианное время вызова, как в timeit.
+
+        Первый прогон прогревает кеши, второй считает запросы к базе
+        и задаёт число вызовов в замере: быстрые кейсы повторяются,
+        пока замер не займёт MIN_SAMPLE, иначе шум таймера и
+        планировщика сравним с самим временем. Сборщик мусора на время
+        замеров выключен.
+        """
+        func()
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            func()
+        elapsed = time.perf_counter() - started
+        number = max(1, math.ceil(MIN_SAMPLE / max(elapsed, 1e-6)))
+        timings = []
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                for _ in range(number):
+                    func()
+                timings.append(
+                    (time.perf_counter() - started) * 1000 / number
+                )
+        finally:
+            gc.enable()
+        return {
+            "best_ms": round(min(timings), 3),
+            "median_ms": round(statistics.median(timings), 3),
+            "queries": counter.count,
+        }
+
+    def _load_baseline(self, path):
+        try:
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read the baseline: {error}")
+
+    def _compare(self, result, expected, threshold):
+        """Статус кейса относительно базовой линии."""
+        if expected is None:
+            return "new"
+        if result["queries"] > expected["queries"]:
+            return "REGRESSION (queries)"
+        if result["best_ms"] > expected["best_ms"] * (1 + threshold):
+            return "REGRESSION"
+        if result["best_ms"] < expected["best_ms"] * (1 - threshold):
+            return "faster"
+        return "ok"
+
+    def handle(self, *args, **kwargs):
+        if kwargs["repeat"] < 1 or kwargs["threshold"] < 0:
+            raise CommandError("--repeat must be >= 1, --threshold >= 0")
+        baseline = self._load_baseline(kwargs["baseline"])
+        if baseline and baseline["meta"]["environment"] != environment():
+            self.stderr.write(self.style.WARNING(
+                "The baseline was recorded in another environment "
+                f"({baseline['meta']['environment']}): timings are not "
+                "comparable, update the baseline on this machine."
+            ))
+        expected_cases = baseline["cases"] if baseline else {}
+
+        results = {}
+        with transaction.atomic():
+            fixture = Fixture(random.Random(kwargs["seed"]))
+            for name in kwargs["cases"]:
+                func = CASES[name](fixture)
+                results[name] = result = self._measure(func, kwargs["repeat"])
+                status = self._compare(
+                    result, expected_cases.get(name), kwargs["threshold"]
+                )
+                if status == "REGRESSION":
+                    # Замедление подтверждается повторным замером:
+                    # разовый всплеск нагрузки на машине — не регрессия.
+                    retry = self._measure(func, kwargs["repeat"])
+                    results[name] = min(
+                        result, retry, key=lambda item: item["best_ms"]
+                    )
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'case':<28}{'best, ms':>10}{'baseline':>10}{'change':>9}"
+            f"{'queries':>9}  status"
+        )
+        regressions = []
+        for name, result in results.items():
+            expected = expected_cases.get(name)
+            status = self._compare(result, expected, kwargs["threshold"])
+            if status.startswith("REGRESSION"):
+                regressions.append(name)
+            if expected is None:
+                reference = change = "-"
+            else:
+                reference = f"{expected['best_ms']:.2f}"
+                change = f"{result['best_ms'] / expected['best_ms'] - 1:+.0%}"
+            self.stdout.write(
+                f"{name:<28}{result['best_ms']:>10.2f}{reference:>10}"
+                f"{change:>9}{result['queries']:>9}  {status}"
+            )
+
+        if kwargs["update_baseline"]:
+            cases = {**expected_cases, **results}
+            with open(kwargs["baseline"], "w", encoding="utf-8") as file:
+                json.dump({
+                    "meta": {
+                        "created_at": timezone.now().isoformat(),
+                        "environment": environment(),
+                        "repeat": kwargs["repeat"],
+                        "seed": kwargs["seed"],
+                    },
+                    "cases": dict(sorted(cases.items())),
+                }, file, ensure_ascii=False, indent=2)
+                file.write("\n")
+            self.stdout.write(self.style.SUCCESS(
+                f"Baseline written to {kwargs['baseline']}."
+            ))
+        elif regressions:
+            raise CommandError(
+                f"Regressions beyond {kwargs['threshold']:.0%}: "
+                + ", ".join(regressions)
+            )
+        elif baseline is None:
+            self.stderr.write(self.style.WARNING(
+                "No baseline yet: run with --update-baseline."
+            ))
@@ -0,0 +1,137 @@
+import random
+import time
+
+from api.recipes.shopping_list import shopping_list_queryset
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Sum
+from recipes import shopping_list, units
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+
+User = get_user_model()
+
+# Пары ингредиентов, различающихся регистром и соизмеримыми единицами:
+# движок единиц должен свести каждую пару в одну строку.
+UNIT_PAIRS = (("г", "кг"), ("мл", "л"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark shopping list aggregation on a synthetic cart. All "
+        "generated rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument("--ingredients", type=int, default=10)
+        parser.add_argument("--pairs", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _measure(self, label, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = func()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f"{label:<36}{len(rows):>8}{min(timings) * 1000:>12.1f}"
+        )
+
+    def _create_cart(self, rng, kwargs):
+        user = User.objects.create(
+            username="benchmark_shopping_list",
+            email="benchmark_shopping_list@example.com",
+        )
+        ingredients = list(Ingredient.objects.all()[:2000])
+        paired = []
+        for index in range(kwargs["pairs"]):
+            small, large = UNIT_PAIRS[index % len(UNIT_PAIRS)]
+            name = f"benchmark ингредиент {index}"
+            paired += Ingredient.objects.bulk_create([
+                Ingredient(name=name, measurement_unit=small),
+                Ingredient(name=name.capitalize(), measurement_unit=large),
+            ])
+        ingredients += paired
+        if len(ingredients) < kwargs["ingredients"]:
+            raise CommandError("Load ingredients first (load_data).")
+
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=user,
+                name=f"Benchmark {index}",
+                text="Benchmark",
+                cooking_time=10,
+                image="recipes/images/benchmark.jpg",
+            )
+            for index in range(kwargs["recipes"])
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=rng.randint(1, 100),
+                )
+                for recipe in recipes
+                for ingredient in rng.sample(
+                    ingredients, kwargs["ingredients"]
+                )
+            ),
+            batch_size=5000,
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe) for recipe in recipes
+        )
+        started = time.perf_counter()
+        shopping_list.rebuild([user.id])
+        self.stdout.write(
+            f"Cart of {len(recipes)} recipes, materialized in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return user
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        repeat = kwargs["repeat"]
+        with transaction.atomic():
+            user = self._create_cart(rng, kwargs)
+            raw = RecipeIngredient.objects.filter(
+                recipe__shoppingcarts__user=user
+            )
+            self.stdout.write(f"{'step':<36}{'rows':>8}{'best, ms':>12}")
+            self._measure(
+                "join + GROUP BY (name, unit)",
+                lambda: list(
+                    raw.values(
+                        name=F("ingredient__name"),
+                        unit=F("ingredient__measurement_unit"),
+                    ).annotate(total=Sum("amount")).order_by("name")
+                ),
+                repeat,
+            )
+            self._measure(
+                "materialized read",
+                lambda: list(shopping_list_queryset(user)),
+                repeat,
+            )
+            self._measure(
+                "materialized read + units",
+                lambda: list(units.aggregate(
+                    shopping_list_queryset(user).iterator()
+                )),
+                repeat,
+            )
+            self._measure(
+                "raw rows + units (single pass)",
+                lambda: list(units.aggregate(
+                    raw.values(
+                        name=F("ingredient__name"),
+                        unit=F("ingredient__measurement_unit"),
+                        total=F("amount"),
+                    ).iterator()
+                )),
+                repeat,
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
@@ -0,0 +1,115 @@
+import time
+
+from api.query_budget import count_queries
+from api.users.serializers import SubscriptionSerializer
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from foodgram.constants import MAX_PAGE_SIZE
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the subscriptions endpoint while the number of followed "
+        "authors grows. All generated rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--authors", type=int, nargs="+", default=[10, 100, 1000]
+        )
+        parser.add_argument("--recipes", type=int, default=20)
+        parser.add_argument("--recipes-limit", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            with count_queries() as counter:
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+        return counter.count, min(timings) * 1000
+
+    def _follow(self, subscriber, total, recipes_per_author):
+        start = User.objects.filter(
+            username__startswith="benchmark_author_"
+        ).count()
+        authors = User.objects.bulk_create(
+            User(
+                username=f"benchmark_author_{index}",
+                email=f"benchmark_author_{index}@example.com",
+                recipes_count=recipes_per_author,
+            )
+            for index in range(start, total)
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=author,
+                    name=f"Benchmark {index}",
+                    text="Benchmark",
+                    cooking_time=10,
+                    image="recipes/images/benchmark.jpg",
+                )
+                for author in authors
+                for index in range(recipes_per_author)
+            ),
+            batch_size=5000,
+        )
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=subscriber, author=author)
+            for author in authors
+        )
+
+    def handle(self, *args, **kwargs):
+        repeat = kwargs["repeat"]
+        recipes_limit = kwargs["recipes_limit"]
+        with transaction.atomic():
+            subscriber = User.objects.create(
+                username="benchmark_subscriber",
+                email="benchmark_subscriber@example.com",
+            )
+            client = APIClient(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+            client.force_authenticate(subscriber)
+            request = Request(APIRequestFactory().get(
+                "/", {"recipes_limit": recipes_limit}
+            ))
+            request.user = subscriber
+
+            self.stdout.write(
+                f"{'authors':>8}{'page':>6}"
+                f"{'endpoint q':>12}{'ms':>9}"
+                f"{'per-author q':>14}{'ms':>9}"
+            )
+            for total in sorted(kwargs["authors"]):
+                self._follow(subscriber, total, kwargs["recipes"])
+                page = min(total, MAX_PAGE_SIZE)
+                url = (
+                    f"/api/users/subscriptions/?limit={page}"
+                    f"&recipes_limit={recipes_limit}"
+                )
+                queries, elapsed = self._measure(
+                    lambda: client.get(url), repeat
+                )
+                # Прежний путь: сериализатор без prefetch и аннотаций
+                # спрашивает подписку и рецепты отдельно для каждого автора.
+                naive_queries, naive_elapsed = self._measure(
+                    lambda: SubscriptionSerializer(
+                        User.objects.filter(authors__subscriber=subscriber)
+                        .order_by("username")[:page],
+                        many=True,
+                        context={"request": request},
+                    ).data,
+                    repeat,
+                )
+                self.stdout.write(
+                    f"{total:>8}{page:>6}{queries:>12}{elapsed:>9.1f}"
+                    f"{naive_queries:>14}{naive_elapsed:>9.1f}"
+                )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
@@ -0,0 +1,98 @@
+import random
+
+from api.query_budget import QueryBudgetExceeded, assert_query_budget
+from api.recipes.views import IngredientViewSet, RecipeViewSet
+from api.users.views import UsersViewSet
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIClient
+from users.models import User
+
+from .benchmark_micro import Fixture
+
+ENDPOINTS = (
+    ("/api/recipes/", RecipeViewSet, "list"),
+    ("/api/recipes/?is_favorited=1", RecipeViewSet, "list"),
+    ("/api/recipes/?is_in_shopping_cart=1", RecipeViewSet, "list"),
+    ("/api/recipes/download_shopping_cart/", RecipeViewSet,
+     "download_basket"),
+    ("/api/users/", UsersViewSet, "list"),
+    ("/api/users/subscriptions/?recipes_limit=3", UsersViewSet,
+     "subscriptions"),
+    ("/api/ingredients/?name=а", IngredientViewSet, "list"),
+)
+PAGED_ACTIONS = ("list", "subscriptions")
+# Отдельный кеш на время проверки: данные синтетического набора
+# откатываются, и их снимки не должны остаться в общем кеше.
+ISOLATED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "check_query_budgets",
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that API endpoints stay within their query budgets. By "
+        "default the requests run as the viewer of the synthetic "
+        "benchmark_micro dataset (needs loaded ingredients; rolled back "
+        "afterwards), so the result does not depend on the database "
+        "contents; --email checks a real user instead"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email", type=str,
+            help="Email of an existing user to run requests as",
+        )
+        parser.add_argument(
+            "--page-sizes", type=int, nargs="+", default=[1, 10, 50],
+            help="Page sizes to check every paginated endpoint with",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42,
+            help="Seed of the synthetic dataset",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["email"]:
+            user = User.objects.filter(email=kwargs["email"]).first()
+            if user is None:
+                raise CommandError(f"No user with email {kwargs['email']}.")
+            failures = self.check_budgets(user, kwargs["page_sizes"])
+        else:
+            with override_settings(CACHES=ISOLATED_CACHES):
+                with transaction.atomic():
+                    fixture = Fixture(random.Random(kwargs["seed"]))
+                    failures = self.check_budgets(
+                        fixture.viewer, kwargs["page_sizes"]
+                    )
+                    transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} endpoint(s) over budget.")
+        self.stdout.write(self.style.SUCCESS("All endpoints within budget."))
+
+    def check_budgets(self, user, page_sizes):
+        """Проверяет ENDPOINTS от имени user; возвращает нарушения."""
+        client = APIClient(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        client.force_authenticate(user)
+        failures = []
+        for url, view_class, action in ENDPOINTS:
+            if action in PAGED_ACTIONS and view_class.pagination_class:
+                paged = page_sizes
+            else:
+                paged = None
+            try:
+                counts = assert_query_budget(
+                    client, url, view_class, action, page_sizes=paged
+                )
+            except QueryBudgetExceeded as error:
+                failures.append(str(error))
+                self.stderr.write(self.style.ERROR(f"FAIL {error}"))
+                continue
+            self.stdout.write(f"OK   {url} {counts}")
+        return failures
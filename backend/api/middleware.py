@@ -0,0 +1,166 @@
+import cProfile
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import profiling
+from .query_budget import (QueryBudgetExceeded, QueryCounter,
+                           get_query_budget, logger)
+
+
+def view_action(view_func, method):
+    """Класс вьюсета и действие для метода запроса или (None, None)."""
+    view_class = getattr(view_func, "cls", None)
+    actions = getattr(view_func, "actions", None)
+    if view_class is None or not actions:
+        return None, None
+    return view_class, actions.get(method.lower())
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы запроса и сверяет их с бюджетом вьюсета.
+
+    В продакшене нарушения пишутся в лог foodgram.queries, при
+    QUERY_BUDGET_RAISE = True (в тестах) выбрасывается исключение.
+    Потоковый ответ выполняет запросы уже после выхода из вьюхи,
+    поэтому он проверяется, когда клиент дочитает его до конца.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self.counted(
+                request, counter, response.streaming_content
+            )
+            return response
+        self.check(request, counter)
+        if settings.DEBUG:
+            response["X-Query-Count"] = str(counter.count)
+        return response
+
+    def counted(self, request, counter, content):
+        """Отдаёт части потока, считая запросы, которые их строят.
+
+        Обёртка ставится только на время получения очередной части:
+        между частями соединением может пользоваться другой код.
+        """
+        chunks = iter(content)
+        while True:
+            with connection.execute_wrapper(counter):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+        self.check(request, counter)
+
+    def check(self, request, counter):
+        label, budget = getattr(
+            request, "_query_budget", (request.path, None)
+        )
+        problems = counter.problems(budget)
+        if problems:
+            message = f"{request.method} {label}: " + "; ".join(problems)
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class, action = view_action(view_func, request.method)
+        if view_class is None:
+            return None
+        request._query_budget = (
+            f"{view_class.__name__}.{action}",
+            get_query_budget(view_class, action),
+        )
+        return None
+
+
+class ProfilingMiddleware:
+    """Время запроса по разделам и выборочные дампы cProfile.
+
+    Заголовок Server-Timing с временем БД, сериализаторов, разбора
+    картинок и рендеринга получают сотрудники (SERVER_TIMING = "staff")
+    или все (SERVER_TIMING = "all"). Доля PROFILING_SAMPLE_RATE запросов
+    выполняется под cProfile с дампом в PROFILING_DIR. При ненулевом
+    PROFILING_SLOW_REQUEST_MS под cProfile идёт каждый запрос, а дамп
+    сохраняется только для медленных: профилировщик заметно замедляет
+    процесс, так что порог включают на время разбирательства.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+        profiler = (
+            cProfile.Profile()
+            if sampled or settings.PROFILING_SLOW_REQUEST_MS else None
+        )
+        counter = QueryCounter()
+        timings, token = profiling.start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            profiling.stop(token)
+        total = time.perf_counter() - started
+        timings.add("db", counter.duration)
+
+        if profiler is not None and (
+            sampled or total * 1000 >= settings.PROFILING_SLOW_REQUEST_MS
+        ):
+            label = getattr(request, "_profile_label", request.path)
+            profiling.dump(profiler, f"{request.method}-{label}", total)
+        if self.server_timing_allowed(request):
+            response["Server-Timing"] = timings.server_timing(
+                total, counter.count
+            )
+        return response
+
+    def server_timing_allowed(self, request):
+        if settings.SERVER_TIMING == "all":
+            return True
+        # Пользователь известен и для токенов: DRF при аутентификации
+        # записывает его в исходный HttpRequest.
+        user = getattr(request, "user", None)
+        return (
+            settings.SERVER_TIMING == "staff"
+            and user is not None and user.is_staff
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class, action = view_action(view_func, request.method)
+        request._profile_label = (
+            f"{view_class.__name__}.{action}" if view_class is not None
+            else getattr(view_func, "__name__", request.path)
+        )
+        return None
+
+    def process_template_response(self, request, response):
+        # Ответ DRF рендерится после выхода из вьюхи: время считается
+        # от этого хука до колбэка после рендеринга.
+        timings = profiling.current()
+        if timings is None:
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            timings.add("render", time.perf_counter() - started)
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -1,5 +1,15 @@
-from foodgram.constants import PAGE_SIZE
-from rest_framework.pagination import PageNumberPagination
+import json
+import operator
+from functools import reduce
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from foodgram.constants import MAX_PAGE_SIZE, PAGE_SIZE
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+CURSOR_MODE = "cursor"
+PAGINATION_MODE_PARAM = "pagination"
 
 
 class RecipePagination(PageNumberPagination):
@@ -7,3 +17,167 @@ class RecipePagination(PageNumberPagination):
 
     page_size = PAGE_SIZE
     page_size_query_param = "limit"
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Курсор по всем полям ordering, а не только по первому.
+
+    CursorPagination из DRF фильтрует только по первому полю, а рецепты
+    с той же датой пропускает через OFFSET. Здесь позиция — значения
+    всех полей (последнее должно быть уникальным), и страница ищется
+    условием (a < x) OR (a = x AND b > y), которое идёт по индексу
+    на те же поля; смещение в курсоре не нужно.
+    """
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[field_name]
+            else:
+                value = getattr(instance, field_name)
+            values.append(
+                value.isoformat() if hasattr(value, "isoformat")
+                else str(value)
+            )
+        return json.dumps(values)
+
+    def keyset_filter(self, position, reverse):
+        """Условие «после позиции» в направлении обхода."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        conditions, equal = [], {}
+        for order, value in zip(self.ordering, values):
+            field_name = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") != reverse else "gt"
+            conditions.append(
+                Q(**equal, **{f"{field_name}__{lookup}": value})
+            )
+            equal[field_name] = value
+        return reduce(operator.or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Повторяет CursorPagination.paginate_queryset, кроме фильтра
+        # по позиции.
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(
+                *(order[1:] if order.startswith("-") else f"-{order}"
+                  for order in self.ordering)
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(
+                    self.keyset_filter(current_position, reverse)
+                )
+            except (DjangoValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    """Курсорная пагинация ленты рецептов.
+
+    Не считает COUNT(*) и не использует OFFSET: следующая страница
+    ищется по индексу (-pub_date, id) от последнего показанного рецепта.
+    """
+
+    page_size = PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ("-pub_date", "id")
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    """Курсорная пагинация подписок по уникальному username."""
+
+    ordering = ("username",)
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию по параметру ?pagination=cursor.
+
+    Без параметра вьюсет отдаёт постраничный ответ с count, который
+    использует текущий фронтенд. Параметры из cursor_incompatible_params
+    задают свой порядок выдачи, а курсор сортирует по своему полю:
+    вместе с курсором они отклоняются, а не теряют порядок молча.
+    """
+
+    cursor_pagination_class = None
+    cursor_incompatible_params = ()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            mode = params.get(PAGINATION_MODE_PARAM)
+            if self.cursor_pagination_class and mode == CURSOR_MODE:
+                conflicts = [
+                    name for name in self.cursor_incompatible_params
+                    if params.get(name)
+                ]
+                if conflicts:
+                    raise ValidationError({
+                        PAGINATION_MODE_PARAM: (
+                            "Курсорная пагинация несовместима "
+                            f"с параметрами: {', '.join(conflicts)}."
+                        )
+                    })
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -4,3 +4,8 @@ from rest_framework.permissions import SAFE_METHODS, BasePermission
 class IsAuthorOrReadOnly(BasePermission):
     def has_object_permission(self, request, view, obj):
         return request.method in SAFE_METHODS or request.user == obj.author
+
+
+class IsAuthorOrStaff(BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return request.user == obj.author or request.user.is_staff
@@ -0,0 +1,148 @@
+"""Профилирование запросов: время по разделам и дампы cProfile.
+
+Длительности разделов (БД, сериализаторы, разбор картинок, рендеринг)
+копятся в Timings текущего запроса. Код ниже по стеку отмечает свои
+участки через timed() и не знает о запросе: Timings передаётся
+через contextvar, который выставляет ProfilingMiddleware.
+
+Дамп открывается стандартными средствами:
+python -m pstats profiles/<файл>.prof
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from uuid import uuid4
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+
+logger = logging.getLogger("foodgram.profiling")
+
+UNSAFE_RE = re.compile(r"[^\w.-]+")
+# Порядок разделов в заголовке Server-Timing.
+SECTIONS = ("db", "serializer", "image", "render")
+
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class Timings:
+    """Длительности разделов одного запроса, секунды."""
+
+    def __init__(self):
+        self.sections = dict.fromkeys(SECTIONS, 0.0)
+        self.active = set()
+
+    def add(self, name, duration):
+        self.sections[name] = self.sections.get(name, 0.0) + duration
+
+    def server_timing(self, total, queries):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        metrics = [
+            f'db;dur={self.sections["db"] * 1000:.1f};desc="{queries} queries"'
+        ]
+        metrics += [
+            f"{name};dur={duration * 1000:.1f}"
+            for name, duration in self.sections.items()
+            if name != "db" and duration
+        ]
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+def start():
+    """Заводит Timings для текущего запроса; вернуть токен в stop()."""
+    timings = Timings()
+    return timings, _timings.set(timings)
+
+
+def stop(token):
+    _timings.reset(token)
+
+
+def current():
+    return _timings.get()
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время блока к разделу name текущего запроса.
+
+    Вложенные блоки того же раздела не считаются повторно: вложенный
+    сериализатор уже входит во время внешнего. Вне запроса ничего
+    не делает.
+    """
+    timings = _timings.get()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def _timed_method(method, name):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with timed(name):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def _timed_property(prop, name):
+    return property(_timed_method(prop.fget, name))
+
+
+def install():
+    """Включает в раздел serializer вывод (.data) и проверку DRF.
+
+    Serializer.data и ListSerializer.data обращаются к BaseSerializer.data
+    через super(), поэтому достаточно обернуть его; is_valid списка
+    переопределён целиком и оборачивается отдельно.
+    """
+    base = serializers.BaseSerializer
+    if getattr(base, "_profiled", False):
+        return
+    base.data = _timed_property(base.data, "serializer")
+    base.is_valid = _timed_method(base.is_valid, "serializer")
+    serializers.ListSerializer.is_valid = _timed_method(
+        serializers.ListSerializer.is_valid, "serializer"
+    )
+    base._profiled = True
+
+
+def dump(profiler, label, duration):
+    """Пишет дамп в PROFILING_DIR; в имени — вьюсет, действие и время.
+
+    Когда дампов набралось PROFILING_MAX_DUMPS, новые не пишутся,
+    чтобы забытое профилирование не заполнило диск.
+    """
+    directory = Path(settings.PROFILING_DIR)
+    name = "{}-{}-{}ms-{}.prof".format(
+        timezone.now().strftime("%Y%m%d-%H%M%S"),
+        UNSAFE_RE.sub("_", label).strip("_") or "root",
+        round(duration * 1000),
+        uuid4().hex[:8],
+    )
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        with os.scandir(directory) as entries:
+            dumps = sum(entry.name.endswith(".prof") for entry in entries)
+        if dumps >= settings.PROFILING_MAX_DUMPS:
+            logger.warning("Profile %s skipped: %s is full", name, directory)
+            return
+        # Через временный файл: читатель не увидит недописанный дамп.
+        temporary = directory / f".{name}.tmp"
+        profiler.dump_stats(temporary)
+        os.replace(temporary, directory / name)
+    except OSError as error:
+        logger.warning("Cannot write profile %s: %s", name, error)
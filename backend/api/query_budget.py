@@ -0,0 +1,120 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger("foodgram.queries")
+
+LITERAL_RE = re.compile(r"\b\d+\b|'[^']*'")
+PLACEHOLDERS_RE = re.compile(r"%s(?:\s*,\s*%s)+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Эндпоинт выполнил больше запросов, чем ему разрешено."""
+
+
+def normalize_sql(sql):
+    """Приводит SQL к «форме»: без литералов и длины списков IN (...)."""
+    sql = PLACEHOLDERS_RE.sub("%s, ...", sql)
+    return LITERAL_RE.sub("?", sql)
+
+
+def get_query_budget(view_class, action):
+    """Бюджет запросов, объявленный во вьюсете через query_budgets."""
+    return getattr(view_class, "query_budgets", {}).get(action)
+
+
+class QueryCounter:
+    """Счётчик запросов, подключаемый через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.queries = []
+        # Суммарное время запросов, секунды.
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=None):
+        """Одинаковые по форме запросы, повторившиеся threshold раз и более."""
+        if threshold is None:
+            threshold = settings.QUERY_REPEAT_THRESHOLD
+        shapes = Counter(normalize_sql(sql) for sql in self.queries)
+        return {
+            shape: times for shape, times in shapes.items()
+            if times >= threshold
+        }
+
+    def problems(self, budget=None):
+        """Нарушения бюджета и подозрения на N+1 в виде строк."""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(
+                f"выполнено {self.count} запросов при бюджете {budget}"
+            )
+        for shape, times in self.repeated_shapes().items():
+            problems.append(f"запрос повторён {times} раз: {shape[:200]}")
+        return problems
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+@contextmanager
+def assert_max_queries(budget, label=""):
+    """Проваливает тест, если блок превысил бюджет или содержит N+1."""
+    with count_queries() as counter:
+        yield counter
+    problems = counter.problems(budget)
+    if problems:
+        raise QueryBudgetExceeded(f"{label}: " + "; ".join(problems))
+
+
+def assert_query_budget(client, url, view_class, action,
+                        page_sizes=(1, 10, 50), page_size_param="limit"):
+    """Проверяет, что число запросов эндпоинта не растёт с размером страницы.
+
+    Запрос выполняется для каждого размера страницы, и каждый раз
+    количество запросов должно укладываться в бюджет вьюсета. Для
+    эндпоинтов без пагинации передаётся page_sizes=None.
+    """
+    budget = get_query_budget(view_class, action)
+    if budget is None:
+        raise QueryBudgetExceeded(
+            f"{view_class.__name__}.{action}: бюджет не объявлен"
+        )
+    counts = {}
+    separator = "&" if "?" in url else "?"
+    for size in page_sizes or (None,):
+        page_url = url
+        if size is not None:
+            page_url = f"{url}{separator}{page_size_param}={size}"
+        label = f"{view_class.__name__}.{action} ({page_url})"
+        with assert_max_queries(budget, label) as counter:
+            response = client.get(page_url)
+            if response.streaming:
+                # Потоковый ответ выполняет запросы по мере чтения.
+                b"".join(response.streaming_content)
+        if response.status_code >= 400:
+            raise QueryBudgetExceeded(
+                f"{label}: ответ {response.status_code}"
+            )
+        counts[size] = counter.count
+    return counts
@@ -1,6 +1,6 @@
-import django_filters
 from django_filters import rest_framework as filters
-from recipes.models import Ingredient, Recipe
+from recipes.models import Recipe
+from recipes.search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -8,6 +8,7 @@ class RecipeFilter(filters.FilterSet):
 
     is_favorited = filters.BooleanFilter(method="filter_boolean_field")
     is_in_shopping_cart = filters.BooleanFilter(method="filter_boolean_field")
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipe
@@ -30,12 +31,5 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(**{filter_field: self.request.user})
         return queryset.exclude(**{filter_field: self.request.user})
 
-
-class IngredientFilter(django_filters.FilterSet):
-    """Фильтр ингридиентов."""
-
-    name = django_filters.CharFilter(lookup_expr="contains")
-
-    class Meta:
-        model = Ingredient
-        fields = ["name"]
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
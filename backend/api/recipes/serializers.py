@@ -1,10 +1,14 @@
+from api.images import ImageUploadField, ImageVariantsField
 from api.users.serializers import UserSerializer
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from foodgram.constants import (MAX_INGREDIENT, MIN_COOKING_TIME,
                                 MIN_INGREDIENT)
+from recipes import shopping_list
+from recipes.catalog import ingredient_catalog
+from recipes.relations import relations_for
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart)
+                            ShoppingCart, ShortLinkClick)
 from rest_framework import serializers
 
 from .short_serializers import ShortRecipeSerializer
@@ -20,25 +24,71 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+def catalog_snapshot(context):
+    """Снимок справочника ингредиентов, один на сериализацию.
+
+    Хранится в общем context сериализаторов: версия справочника
+    сверяется с кешем один раз, а не на каждое поле ингредиента.
+    """
+    snapshot = context.get("ingredient_catalog")
+    if snapshot is None:
+        snapshot = ingredient_catalog.snapshot()
+        context["ingredient_catalog"] = snapshot
+    return snapshot
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для ингредиентов и количества."""
 
-    id = serializers.IntegerField(source="ingredient.id")
-    name = serializers.CharField(source="ingredient.name")
-    measurement_unit = serializers.\
-        CharField(source="ingredient.measurement_unit")
+    id = serializers.IntegerField(source="ingredient_id")
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeIngredient
         fields = ("id", "name", "measurement_unit", "amount")
 
+    def _get_ingredient(self, obj):
+        # Название и единицу берём из справочника в памяти, а не из JOIN.
+        return (
+            catalog_snapshot(self.context).get(obj.ingredient_id)
+            or obj.ingredient
+        )
+
+    def get_name(self, obj):
+        return self._get_ingredient(obj).name
+
+    def get_measurement_unit(self, obj):
+        return self._get_ingredient(obj).measurement_unit
+
+
+class CatalogIngredientField(serializers.PrimaryKeyRelatedField):
+    """Ингредиент по id, проверяемый по справочнику без запроса в БД."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        ingredient = catalog_snapshot(self.context).get(pk)
+        if ingredient is None:
+            self.fail("does_not_exist", pk_value=data)
+        return ingredient
+
 
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    ingredients = serializers.SerializerMethodField()
+    # Вложенный сериализатор, а не метод: поля строятся один раз
+    # на весь список, а не заново для каждого рецепта.
+    ingredients = RecipeIngredientSerializer(
+        source="recipeingredients", many=True, read_only=True
+    )
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = serializers.ImageField()
+    image_variants = ImageVariantsField("image")
 
     class Meta:
         model = Recipe
@@ -47,6 +97,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "author",
             "name",
             "image",
+            "image_variants",
             "text",
             "ingredients",
             "cooking_time",
@@ -55,24 +106,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and request.user.favorites.filter(recipe=obj).exists()
-        )
+        return obj.id in relations_for(self.context.get("request")).favorites
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and request.user.shoppingcarts.filter(recipe=obj).exists()
-        )
-
-    def get_ingredients(self, obj):
-        result = obj.recipeingredients.all()
-        return RecipeIngredientSerializer(result, many=True).data
+        return obj.id in relations_for(
+            self.context.get("request")
+        ).shopping_cart
 
     def get_short_link(self, obj):
         request = self.context.get("request")
@@ -82,7 +121,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 class AddRecipeIngredientSerializer(serializers.Serializer):
     """Сериализатор для добавления ингредиента к рецепту."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = CatalogIngredientField(queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(
         min_value=MIN_INGREDIENT, max_value=MAX_INGREDIENT
     )
@@ -94,18 +133,18 @@ class AddRecipeSerializer(serializers.ModelSerializer):
     ingredients = AddRecipeIngredientSerializer(
         many=True, min_length=MIN_INGREDIENT
     )
-    image = Base64ImageField()
+    image = ImageUploadField()
     cooking_time = serializers.IntegerField(min_value=MIN_COOKING_TIME)
 
     class Meta:
         model = Recipe
         fields = ["ingredients", "image",
                   "name", "text",
-                  "cooking_time", "link"
+                  "cooking_time"
                   ]
 
     def validate(self, data):
-        if self.instance and "ingredients" not in self.initial_data:
+        if self.instance and "ingredients" not in data:
             raise serializers.ValidationError(
                 {"ingredients": "Поле ingredients обязательно при обновлении."}
             )
@@ -138,21 +177,28 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         return RecipeSerializer(instance, context=self.context).data
 
     def load_new_recipe(self, recipe, ingredients_data):
-        if not recipe.link:
-            recipe.generate_link()
-            recipe.save()
-
         if ingredients_data:
-            recipe.recipeingredients.all().delete()
-            recipe.recipeingredients.bulk_create(
-                RecipeIngredient(
-                    recipe=recipe,
-                    ingredient=ingredient["id"],
-                    amount=ingredient["amount"],
+            old_amounts = shopping_list.recipe_amounts(recipe.id)
+            with shopping_list.bulk_change():
+                recipe.recipeingredients.all().delete()
+                recipe.recipeingredients.bulk_create(
+                    RecipeIngredient(
+                        recipe=recipe,
+                        ingredient=ingredient["id"],
+                        amount=ingredient["amount"],
+                    )
+                    for ingredient in ingredients_data
                 )
-                for ingredient in ingredients_data
+            shopping_list.change_recipe(
+                recipe.id,
+                old_amounts,
+                {
+                    ingredient["id"].id: ingredient["amount"]
+                    for ingredient in ingredients_data
+                },
             )
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get("request")
         ingredients_data = validated_data.pop("ingredients", None)
@@ -160,6 +206,7 @@ class AddRecipeSerializer(serializers.ModelSerializer):
         self.load_new_recipe(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop("ingredients")
         self.load_new_recipe(instance, ingredients_data)
@@ -221,3 +268,11 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             instance.recipe,
             context=self.context
         ).data
+
+
+class ShortLinkClickSerializer(serializers.ModelSerializer):
+    """Переходы по короткой ссылке рецепта за час."""
+
+    class Meta:
+        model = ShortLinkClick
+        fields = ("hour", "count")
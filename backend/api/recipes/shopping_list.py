@@ -0,0 +1,171 @@
+import csv
+import logging
+import os
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.db.models import F
+from foodgram.constants import (SHOPPING_LIST_CHUNK_SIZE,
+                                SHOPPING_LIST_PDF_SPOOL_SIZE)
+from recipes.models import ShoppingListItem
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+TITLE = "Список покупок"
+CSV_HEADER = ("Ингредиент", "Единица измерения", "Количество")
+
+PDF_FONT_NAME = "ShoppingList"
+PDF_FALLBACK_FONT = "Helvetica"
+PDF_MARGIN = 50
+PDF_TITLE_SIZE = 16
+PDF_FONT_SIZE = 11
+PDF_LINE_HEIGHT = 16
+PDF_BLOCK_SIZE = 64 * 1024
+
+
+def shopping_list_queryset(user):
+    """Материализованный список покупок: строка на каждый ингредиент.
+
+    Порядок не задан: строки сортирует recipes.units.aggregate.
+    """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values(
+            name=F("ingredient__name"),
+            unit=F("ingredient__measurement_unit"),
+            total=F("amount"),
+        )
+        .order_by()
+    )
+
+
+def _chunks(rows):
+    rows = iter(rows)
+    while chunk := list(islice(rows, SHOPPING_LIST_CHUNK_SIZE)):
+        yield chunk
+
+
+def _line(row):
+    return f"{row['name']} ({row['unit']}) — {row['total']}"
+
+
+def render_txt(rows):
+    for chunk in _chunks(rows):
+        yield "".join(f"{_line(row)}\n" for row in chunk).encode()
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: writerow сразу возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    # BOM, чтобы Excel открыл кириллицу в UTF-8 без мастера импорта.
+    yield ("\ufeff" + writer.writerow(CSV_HEADER)).encode()
+    for chunk in _chunks(rows):
+        yield "".join(
+            writer.writerow((row["name"], row["unit"], row["total"]))
+            for row in chunk
+        ).encode()
+
+
+def _pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    path = settings.SHOPPING_LIST_PDF_FONT
+    if not os.path.exists(path):
+        logger.warning(
+            "Шрифт %s не найден, кириллица в PDF не отобразится", path
+        )
+        return PDF_FALLBACK_FONT
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    """Рисует PDF во временный файл, который уходит на диск при росте.
+
+    PDF нельзя отдавать по мере генерации (таблица ссылок пишется в
+    конце), поэтому потоком блоками отдаётся уже готовый файл.
+    """
+    font = _pdf_font()
+    width, height = A4
+    max_width = width - 2 * PDF_MARGIN
+    output = SpooledTemporaryFile(max_size=SHOPPING_LIST_PDF_SPOOL_SIZE)
+    pdf = canvas.Canvas(output, pagesize=A4)
+    pdf.setTitle(TITLE)
+    y = height - PDF_MARGIN
+    pdf.setFont(font, PDF_TITLE_SIZE)
+    pdf.drawString(PDF_MARGIN, y, TITLE)
+    y -= 2 * PDF_LINE_HEIGHT
+    pdf.setFont(font, PDF_FONT_SIZE)
+    for chunk in _chunks(rows):
+        for row in chunk:
+            for line in simpleSplit(
+                _line(row), font, PDF_FONT_SIZE, max_width
+            ):
+                if y < PDF_MARGIN:
+                    pdf.showPage()
+                    pdf.setFont(font, PDF_FONT_SIZE)
+                    y = height - PDF_MARGIN
+                pdf.drawString(PDF_MARGIN, y, line)
+                y -= PDF_LINE_HEIGHT
+    pdf.save()
+    output.seek(0)
+    with output:
+        while block := output.read(PDF_BLOCK_SIZE):
+            yield block
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Формат списка покупок для параметра ?format=.
+
+    Файл отдаётся потоком мимо рендерера, поэтому через render проходят
+    только ошибки (например, 401) — они остаются в JSON.
+    """
+
+    charset = "utf-8"
+    export = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = "text/plain"
+    format = "txt"
+    export = staticmethod(render_txt)
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    export = staticmethod(render_csv)
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    export = staticmethod(render_pdf)
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    PDFShoppingListRenderer,
+    JSONRenderer,
+)
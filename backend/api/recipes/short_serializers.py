@@ -1,3 +1,4 @@
+from api.images import ImageVariantsField
 from recipes.models import Recipe
 from rest_framework import serializers
 
@@ -6,7 +7,9 @@ from rest_framework import serializers
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Урезанный сериализатор рецепта для ответов"""
 
+    image_variants = ImageVariantsField("image")
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
         read_only_fields = ("id", "name", "image", "cooking_time")
@@ -1,15 +1,26 @@
-from io import StringIO
-
-from api.pagination import RecipePagination
-from api.permissions import IsAuthorOrReadOnly
+from datetime import timedelta
+
+from api.pagination import (CursorPaginationMixin, RecipeCursorPagination,
+                            RecipePagination)
+from api.conditional import (conditional, ingredients_etag, recipe_etag,
+                             recipe_last_modified, recipe_list_etag,
+                             shopping_list_etag)
+from api.permissions import IsAuthorOrReadOnly, IsAuthorOrStaff
+from api.response_cache import AnonymousResponseCacheMixin
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
-from django.http import FileResponse
+from django.db.models import Sum
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.http import content_disposition_header
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart)
+from foodgram.constants import (SHOPPING_LIST_CHUNK_SIZE,
+                                SHORT_LINK_CLICKS_HOURS,
+                                SHORT_LINK_CLICKS_MAX_HOURS)
+from recipes import units
+from recipes.catalog import ingredient_catalog
+from recipes.link_clicks import current_hour
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (SAFE_METHODS, AllowAny,
@@ -17,38 +28,81 @@ from rest_framework.permissions import (SAFE_METHODS, AllowAny,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 
-from .filters import IngredientFilter, RecipeFilter
+from .filters import RecipeFilter
 from .serializers import (AddRecipeSerializer, FavoriteSerializer,
                           IngredientSerializer, RecipeSerializer,
-                          ShoppingCartSerializer)
+                          ShoppingCartSerializer, ShortLinkClickSerializer)
+from .shopping_list import (SHOPPING_LIST_RENDERERS, ShoppingListRenderer,
+                            TextShoppingListRenderer, shopping_list_queryset)
 
 User = get_user_model()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousResponseCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """ViewSet для ингредиентов."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
-
-
-class RecipeViewSet(viewsets.ModelViewSet):
+    # Ноль запросов, пока справочник загружен; один при перезагрузке.
+    query_budgets = {"list": 1, "retrieve": 1}
+
+    @conditional(ingredients_etag)
+    def list(self, request):
+        name = request.query_params.get("name")
+        if name:
+            ingredients = ingredient_catalog.search(name)
+        else:
+            ingredients = ingredient_catalog.all()
+        return Response(self.get_serializer(ingredients, many=True).data)
+
+    @conditional(ingredients_etag)
+    def retrieve(self, request, pk=None):
+        ingredient = None
+        if pk.isdigit():
+            ingredient = ingredient_catalog.get(int(pk))
+        if ingredient is None:
+            raise Http404
+        return Response(self.get_serializer(ingredient).data)
+
+
+class RecipeViewSet(AnonymousResponseCacheMixin, CursorPaginationMixin,
+                    viewsets.ModelViewSet):
     """ViewSet для рецептов."""
 
     serializer_class = RecipeSerializer
     pagination_class = RecipePagination
+    cursor_pagination_class = RecipeCursorPagination
+    # Поиск сортирует по релевантности.
+    cursor_incompatible_params = ("search",)
     http_method_names = ["get", "post", "patch", "delete"]
     permission_classes = (IsAuthorOrReadOnly, IsAuthenticatedOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    # Холодный путь: запрос токена при аутентификации, запрос снимка
+    # связей пользователя и перезагрузка справочника ингредиентов, если
+    # их нет в кеше, у retrieve ещё запрос версии рецепта для ETag.
+    query_budgets = {
+        "list": 6,
+        "retrieve": 6,
+        "download_basket": 3,
+    }
 
     def get_queryset(self):
-        recipes = Recipe.objects.all()
-        return recipes.select_related("author").prefetch_related("ingredients")
+        # Флаги избранного, корзины и подписки берутся из снимка связей
+        # пользователя (recipes.relations), а не из подзапросов.
+        return Recipe.objects.select_related("author")\
+            .prefetch_related("recipeingredients")
+
+    @conditional(recipe_list_etag)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional(recipe_etag, recipe_last_modified)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
@@ -105,42 +159,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def delete_shopping_cart(self, request, pk=None):
         return self.shopping_cart(request, pk)
 
-    def _format_shopping_list(self, ingredients):
-        output = StringIO()
-        output.write("Список покупок:\n")
-        for name, data in ingredients.items():
-            out = f"- {name} ({data['measurement_unit']}) - {data['amount']}\n"
-            output.write(out)
-        return output.getvalue()
+    def _format_shopping_list(self, renderer, user):
+        """Файл списка покупок в формате рендерера: поток байтов."""
+        rows = shopping_list_queryset(user).iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE
+        )
+        return renderer.export(units.aggregate(rows))
 
     @action(
         detail=False,
         methods=["GET"],
         url_path="download_shopping_cart",
         permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_LIST_RENDERERS,
     )
+    @conditional(shopping_list_etag)
     def download_basket(self, request):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shoppingcarts__user=request.user
-            )
-            .values(
-                name=F("ingredient__name"),
-                unit=F("ingredient__measurement_unit")
-            )
-            .annotate(total=Sum("amount"))
-            .order_by("name")
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, ShoppingListRenderer):
+            renderer = TextShoppingListRenderer()
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        response = StreamingHttpResponse(
+            self._format_shopping_list(renderer, request.user),
+            content_type=content_type,
         )
-
-        content = ""
-        for item in ingredients:
-            content += f"{item['name']} ({item['unit']}) — {item['total']}\n"
-
-        response = FileResponse(
-            content.encode("utf-8"),
-            content_type="text/plain",
-            filename="shopping_list.txt",
-            as_attachment=True,
+        response["Content-Disposition"] = content_disposition_header(
+            True, f"shopping_list.{renderer.format}"
         )
         return response
 
@@ -151,10 +198,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[AllowAny],
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        recipe = get_object_or_404(Recipe.objects.only("id"), pk=pk)
         relative_url = reverse(
             "recipe_short_redirect_view",
-            args=[recipe.link]
+            args=[recipe.short_code]
         )
         full_url = request.build_absolute_uri(relative_url)
         return Response({"short-link": full_url}, status=status.HTTP_200_OK)
+
+    @action(
+        detail=True,
+        methods=["GET"],
+        url_path="link-clicks",
+        permission_classes=[IsAuthenticated, IsAuthorOrStaff],
+    )
+    def link_clicks(self, request, pk=None):
+        """Переходы по короткой ссылке по часам, автору и персоналу."""
+        recipe = get_object_or_404(
+            Recipe.objects.only("id", "author_id"), pk=pk
+        )
+        self.check_object_permissions(request, recipe)
+        hours = request.query_params.get("hours", "")
+        hours = min(
+            int(hours) if hours.isdigit() else SHORT_LINK_CLICKS_HOURS,
+            SHORT_LINK_CLICKS_MAX_HOURS,
+        )
+        clicks = recipe.short_link_clicks.filter(
+            hour__gt=current_hour() - timedelta(hours=hours)
+        )
+        return Response({
+            "total": clicks.aggregate(total=Sum("count"))["total"] or 0,
+            "hours": ShortLinkClickSerializer(clicks, many=True).data,
+        })
@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+GENERATION_KEY = "api:content_generation"
+CACHE_HEADER = "X-Response-Cache"
+# Заголовки, которые сохраняются вместе с телом ответа.
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+
+def content_generation():
+    """Поколение публичного содержимого, общее для всех процессов."""
+    return cache.get_or_set(GENERATION_KEY, lambda: uuid4().hex, None)
+
+
+def bump_generation():
+    cache.set(GENERATION_KEY, uuid4().hex, None)
+
+
+class ResponseCache:
+    """LRU-кеш готовых ответов в памяти процесса.
+
+    Ключ включает поколение содержимого, поэтому после любой записи
+    в модели старые ответы перестают находиться; при смене поколения
+    кеш заодно очищается, чтобы не держать мёртвые записи.
+
+    Поколение хранится в кеше Django: чтобы его смену видели все
+    процессы, включая команды load_data, import_recipes и
+    generate_data, нужен общий бэкенд кеша (см. CACHES в settings).
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _sync(self, generation):
+        if generation != self._generation:
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key, generation):
+        with self._lock:
+            self._sync(generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, generation, entry):
+        with self._lock:
+            self._sync(generation)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def cache_key(request):
+    """Схема, хост, путь, отсортированные параметры запроса и Accept.
+
+    Хост и схема входят в ключ: в ответах абсолютные ссылки
+    (картинки, next/previous пагинации), и ответ для одного хоста
+    нельзя отдавать клиентам другого.
+    """
+    query = urlencode(sorted(
+        parse_qsl(request.META.get("QUERY_STRING", ""), keep_blank_values=True)
+    ))
+    return (
+        request.scheme, request.get_host(), request.path, query,
+        request.META.get("HTTP_ACCEPT", ""),
+    )
+
+
+class AnonymousResponseCacheMixin:
+    """Отдаёт анонимным GET-запросам сохранённые ответы вьюсета.
+
+    Проверка идёт до аутентификации и сериализации. Аутентификация
+    в проекте только по токену, поэтому запрос без заголовка
+    Authorization заведомо анонимный.
+    """
+
+    cached_actions = ("list", "retrieve")
+
+    def _is_cacheable(self, request):
+        return (
+            request.method in ("GET", "HEAD")
+            and self.action_map.get(request.method.lower())
+            in self.cached_actions
+            and "HTTP_AUTHORIZATION" not in request.META
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self._is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = cache_key(request)
+        generation = content_generation()
+        entry = response_cache.get(key, generation)
+        if entry is not None:
+            content, headers = entry
+            last_modified = parse_http_date_safe(
+                headers.get("Last-Modified", "")
+            )
+            response = get_conditional_response(
+                request, etag=headers.get("ETag"), last_modified=last_modified
+            ) or HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            response[CACHE_HEADER] = "HIT"
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, "render"):
+                response.render()
+            response_cache.set(key, generation, (
+                response.content,
+                {
+                    header: response[header]
+                    for header in STORED_HEADERS
+                    if response.has_header(header)
+                },
+            ))
+        response[CACHE_HEADER] = "MISS"
+        if settings.DEBUG:
+            response[f"{CACHE_HEADER}-Stats"] = "; ".join(
+                f"{name}={value}"
+                for name, value in response_cache.stats().items()
+            )
+        return response
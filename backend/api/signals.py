@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+from .response_cache import bump_generation
+
+User = get_user_model()
+
+PUBLIC_MODELS = (Recipe, RecipeIngredient, Ingredient, User)
+
+
+def bump_content_generation(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login — на ответы это
+    # не влияет, и сбрасывать из-за него кеш незачем.
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    transaction.on_commit(bump_generation)
+
+
+for model in PUBLIC_MODELS:
+    receiver((post_save, post_delete), sender=model)(bump_content_generation)
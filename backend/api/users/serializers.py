@@ -1,6 +1,7 @@
+from api.images import ImageUploadField, ImageVariantsField
 from api.recipes.short_serializers import ShortRecipeSerializer
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from recipes.relations import relations_for
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from users.models import Subscription, User
@@ -8,7 +9,8 @@ from users.models import Subscription, User
 
 class UserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = Base64ImageField(required=False, label="Аватар")
+    avatar = ImageUploadField(required=False, label="Аватар")
+    avatar_variants = ImageVariantsField("avatar")
 
     class Meta:
         model = User
@@ -20,22 +22,23 @@ class UserSerializer(DjoserUserSerializer):
             "last_name",
             "is_subscribed",
             "avatar",
+            "avatar_variants",
         )
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
-        return (
-            request
-            and request.user.is_authenticated
-            and request.user.subscriptions.filter(author=obj).exists()
-        )
+        if request is None or request.user.pk == obj.pk:
+            return False
+        return obj.pk in relations_for(request).following
 
 
 class UserAvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для аватара пользователя."""
 
-    avatar = Base64ImageField()
+    avatar = ImageUploadField()
 
     class Meta:
         model = User
@@ -78,12 +81,16 @@ class SubscriptionSerializer(UserSerializer):
     """Сериализатор информации о подписках."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source="recipes.count")
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ("recipes", "recipes_count")
 
     def get_recipes(self, obj):
+        if hasattr(obj, "latest_recipes"):
+            return ShortRecipeSerializer(
+                obj.latest_recipes, many=True, context=self.context
+            ).data
         request = self.context.get("request")
         recipes_limit = request.query_params.get("recipes_limit")
         recipes = obj.recipes.all()
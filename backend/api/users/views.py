@@ -1,20 +1,63 @@
+from api.images import RawImageParser
+from api.pagination import (CursorPaginationMixin, RecipePagination,
+                            SubscriptionCursorPagination)
+from api.response_cache import AnonymousResponseCacheMixin
 from api.users.serializers import (SubscriptionCreateSerializer,
                                    SubscriptionSerializer,
                                    UserAvatarSerializer)
+from django.db.models import F, Prefetch, Value, Window
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
+from recipes.models import Recipe
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import (FormParser, JSONParser,
+                                    MultiPartParser)
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from users.models import User
 
 
-class UsersViewSet(DjoserUserViewSet):
+def latest_recipes(limit=None):
+    """Последние рецепты авторов для prefetch: не больше limit на автора.
+
+    Топ-N считается в одном запросе оконной функцией ROW_NUMBER()
+    по автору, поэтому страница подписок не тянет все рецепты авторов.
+    """
+    recipes = Recipe.objects.only(
+        "id", "name", "image", "image_variants", "cooking_time", "author"
+    ).order_by("-pub_date", "-id")
+    if limit is None or not limit.isdigit():
+        return recipes
+    return recipes.annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F("author"),
+            order_by=(F("pub_date").desc(), F("id").desc()),
+        )
+    ).filter(position__lte=int(limit))
+
+
+class UsersViewSet(AnonymousResponseCacheMixin, CursorPaginationMixin,
+                   DjoserUserViewSet):
     """ViewSet для работы с пользователями"""
 
     lookup_url_kwarg = "pk"
+    cached_actions = ("list",)
+    pagination_class = RecipePagination
+    cursor_pagination_class = SubscriptionCursorPagination
+    # Поле, в которое RawImageParser кладёт картинку из тела запроса.
+    raw_image_field = "avatar"
+    # С учётом запроса токена при аутентификации и запроса снимка
+    # связей пользователя, если его нет в кеше.
+    query_budgets = {
+        "list": 3,
+        "retrieve": 2,
+        "me": 1,
+        "subscriptions": 4,
+    }
 
     @action(
         detail=False,
@@ -61,7 +104,18 @@ class UsersViewSet(DjoserUserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(authors__subscriber=user)
+        queryset = (
+            User.objects.filter(authors__subscriber=user)
+            .annotate(is_subscribed=Value(True))
+            .prefetch_related(Prefetch(
+                "recipes",
+                queryset=latest_recipes(
+                    request.query_params.get("recipes_limit")
+                ),
+                to_attr="latest_recipes",
+            ))
+            .order_by("username")
+        )
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
             page, many=True, context={"request": request}
@@ -73,6 +127,9 @@ class UsersViewSet(DjoserUserViewSet):
         methods=["PUT"],
         url_path="me/avatar",
         permission_classes=[IsAuthenticated],
+        parser_classes=[
+            JSONParser, MultiPartParser, FormParser, RawImageParser
+        ],
     )
     def upload_avatar(self, request):
         user = request.user
@@ -88,7 +145,11 @@ class UsersViewSet(DjoserUserViewSet):
     @upload_avatar.mapping.delete
     def delete_avatar(self, request):
         user = request.user
-        user.avatar.delete()
+        # Файл может быть общим с другими загрузками (хранилище по
+        # содержимому): удалит его сборщик мусора, когда ссылок не
+        # останется.
+        user.avatar = None
+        user.save(update_fields=("avatar",))
         return Response(
             {"detail": "Аватар успешно удален"},
             status=status.HTTP_204_NO_CONTENT
@@ -4,6 +4,8 @@ python manage.py migrate
 python manage.py collectstatic --noinput
 python manage.py load_data data/ingredients.json
 python manage.py loaddata data/initial_data.json
+python manage.py reconcile_counters
+python manage.py collect_media --recount
 
 # Создание суперпользователя
 python manage.py shell -c "
@@ -1,4 +1,5 @@
 PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
 
 MAX_LENGTH_EMAIL = 254
 MAX_LENGTH_USERNAME = 150
@@ -10,4 +11,32 @@ MIN_INGREDIENT = 1
 MAX_INGREDIENT = 100
 
 MAX_LENGTH_LINK = 10
-LENGTH_SHORT_LINK = 5
+# Прежние случайные коды были из 5 букв; новые коды длиннее, поэтому
+# никогда не совпадают со старыми ссылками.
+LENGTH_SHORT_LINK = 6
+SHORT_LINK_REDIRECT_MAX_AGE = 60 * 10
+SHORT_LINK_CLICKS_HOURS = 24 * 7
+SHORT_LINK_CLICKS_MAX_HOURS = 24 * 90
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+# Загружаемые картинки: размер файла, число пикселей до распаковки
+# (защита от decompression bomb) и длинная сторона после уменьшения.
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIDE = 2048
+IMAGE_JPEG_QUALITY = 85
+# Очередь заданий на варианты картинок: попытки, пауза перед повтором
+# (удваивается с каждой попыткой) и время, после которого задание
+# упавшего воркера выдаётся снова, в секундах.
+IMAGE_JOB_MAX_ATTEMPTS = 5
+IMAGE_JOB_RETRY_DELAY = 30
+IMAGE_JOB_TIMEOUT = 60 * 10
+# Файл без ссылок удаляется не раньше, чем через столько секунд после
+# последней загрузки: ссылку на него может ещё сохранять другой запрос.
+MEDIA_GC_GRACE_PERIOD = 60 * 15
+
+SHOPPING_LIST_CHUNK_SIZE = 2000
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024
+
+RELATIONS_CACHE_TIMEOUT = 60 * 60
@@ -44,6 +44,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.ProfilingMiddleware",
+    "api.middleware.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "foodgram.urls"
@@ -78,6 +80,21 @@ DATABASES = {
     }
 }
 
+# В этом кеше живут версии, по которым процессы узнают об изменениях:
+# поколение кеша ответов, связи пользователей, ETag рецептов,
+# справочники в памяти. Их меняют и другие процессы (воркер картинок,
+# load_data, import_recipes, generate_data), поэтому в продакшене
+# нужен общий бэкенд: docker-compose поднимает Redis. LocMemCache
+# годится только для одного процесса при разработке.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "foodgram"),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",  # noqa: E501
@@ -122,6 +139,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static_backend")
 MEDIA_URL = "/media_backend/"
 MEDIA_ROOT = BASE_DIR / "media_backend"
 
+STORAGES = {
+    # Загрузки хранятся по хешу содержимого, см. recipes.storage.
+    "default": {"BACKEND": "recipes.storage.ContentAddressedStorage"},
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 
 DJOSER = {
     "USER_CREATE_PASSWORD_RETYPE": False,
@@ -141,5 +166,47 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+QUERY_BUDGET_RAISE = (
+    os.getenv("QUERY_BUDGET_RAISE", "False").lower() in positive_answer
+)
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))
+
+# Профилирование запросов (api.middleware.ProfilingMiddleware).
+# Кому отдавать заголовок Server-Timing: off, staff или all.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "staff")
+# Доля запросов, профилируемых cProfile, от 0 до 1.
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+# Дамп любого запроса дольше порога, мс; 0 — выключено.
+PROFILING_SLOW_REQUEST_MS = int(os.getenv("PROFILING_SLOW_REQUEST_MS", 0))
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_DUMPS = int(os.getenv("PROFILING_MAX_DUMPS", 1000))
+
+# Размер LRU-кеша ответов анонимным пользователям в каждом процессе.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+
+# TTF-шрифт с кириллицей для PDF-списка покупок (пакет font-dejavu).
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT", "/usr/share/fonts/dejavu/DejaVuSans.ttf"
+)
+
+# Ключ перестановки коротких ссылок. Должен быть постоянным: при смене
+# ключа все выданные короткие ссылки перестанут открываться.
+SHORT_LINK_KEY = os.getenv("SHORT_LINK_KEY", "foodgram-short-links")
+# Размер кеша «короткая ссылка -> рецепт» в каждом процессе.
+SHORT_LINK_CACHE_MAX_ENTRIES = int(
+    os.getenv("SHORT_LINK_CACHE_MAX_ENTRIES", 10000)
+)
+# Как часто воркер сбрасывает накопленные переходы по ссылкам, секунды.
+SHORT_LINK_CLICKS_FLUSH_INTERVAL = int(
+    os.getenv("SHORT_LINK_CLICKS_FLUSH_INTERVAL", 60)
+)
+# Переходы считает зеркальный запрос nginx (mirror), поэтому редирект
+# можно кешировать в nginx. Без прокси (runserver) переход считает сам
+# редирект, и кешируется он только в браузере.
+SHORT_LINK_CLICKS_FROM_PROXY = (
+    os.getenv("SHORT_LINK_CLICKS_FROM_PROXY", "False").lower()
+    in positive_answer
+)
+
 UPLOAD_AVATAR = "users/images/"
 UPLOAD_RECIPES = "recipes/images/"
@@ -2,7 +2,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
-from recipes.views import recipe_short_redirect_view
+from recipes.views import recipe_short_redirect_view, short_link_click_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -12,6 +12,12 @@ urlpatterns = [
         recipe_short_redirect_view,
         name="recipe_short_redirect_view"
     ),
+    # Только для зеркальных запросов nginx, наружу не проксируется.
+    path(
+        "internal/short-link-click/",
+        short_link_click_view,
+        name="short_link_click_view"
+    ),
 ]
 
 if settings.DEBUG:
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart)
+from recipes.models import (Favorite, ImageVariantJob, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, ShortLinkClick,
+                            StoredFile)
 
 
 @admin.register(Ingredient)
@@ -51,10 +52,6 @@ class RecipeAdmin(admin.ModelAdmin):
             )
         return "—"
 
-    @admin.display(description="Добавления в избранное")
-    def favorites_count(self, obj):
-        return obj.favorites.count()
-
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -72,3 +69,40 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ("user", "recipe")
     search_fields = ("user__username", "recipe__name")
     list_filter = ("user",)
+
+
+@admin.register(ShortLinkClick)
+class ShortLinkClickAdmin(admin.ModelAdmin):
+    """Админка для переходов по коротким ссылкам."""
+
+    list_display = ("recipe", "hour", "count")
+    search_fields = ("recipe__name",)
+    date_hierarchy = "hour"
+    list_select_related = ("recipe",)
+    readonly_fields = ("recipe", "hour", "count")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ImageVariantJob)
+class ImageVariantJobAdmin(admin.ModelAdmin):
+    """Админка для очереди вариантов картинок."""
+
+    list_display = (
+        "target", "object_id", "source", "status", "attempts", "run_after"
+    )
+    list_filter = ("status", "target")
+    readonly_fields = ("target", "object_id", "source", "locked_at", "error")
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    """Админка для файлов хранилища."""
+
+    list_display = ("name", "references", "used_at")
+    search_fields = ("name",)
+    readonly_fields = ("name", "references", "used_at")
+
+    def has_add_permission(self, request):
+        return False
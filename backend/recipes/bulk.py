@@ -0,0 +1,129 @@
+import io
+import json
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+from . import media, relations
+from .catalog import ingredient_catalog
+from .short_link_cache import short_link_cache
+from .shopping_list import find_inconsistent_users, rebuild
+
+BATCH_SIZE = 1000
+TEMPORARY_TABLE = "bulk_load"
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла.
+
+    Меняет поля модели на время блока, поэтому годится только для
+    команд, а не для процессов, обслуживающих запросы.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False)
+        or getattr(field, "auto_now_add", False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _copy_value(field, instance):
+    value = field.pre_save(instance, True)
+    if value is None:
+        return "\\N"
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, ensure_ascii=False)
+    else:
+        value = field.get_db_prep_save(value, connection)
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+def _copy(model, objects):
+    """COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING.
+
+    COPY не умеет пропускать конфликты, поэтому строки сначала
+    попадают во временную таблицу той же структуры.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objects[0].pk is None)
+    ]
+    buffer = io.StringIO()
+    for instance in objects:
+        buffer.write(
+            "\t".join(_copy_value(field, instance) for field in fields)
+            + "\n"
+        )
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ", ".join(quote(field.column) for field in fields)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {TEMPORARY_TABLE} "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            f"COPY {TEMPORARY_TABLE} ({columns}) FROM STDIN", buffer
+        )
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) "
+            f"SELECT {columns} FROM {TEMPORARY_TABLE} "
+            "ON CONFLICT DO NOTHING"
+        )
+        cursor.execute(f"DROP TABLE {TEMPORARY_TABLE}")
+
+
+def insert(model, objects):
+    """Вставляет объекты в обход save() и сигналов, пропуская конфликты.
+
+    На PostgreSQL — через COPY, иначе через bulk_create.
+    """
+    if not objects:
+        return
+    if connection.vendor == "postgresql":
+        _copy(model, objects)
+    else:
+        model.objects.bulk_create(
+            objects, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+
+
+def reset_sequences(*model_classes):
+    """Сдвигает автоинкремент за вставленные явно id (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), model_classes
+    )
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def refresh_derived(user_ids=()):
+    """Приводит в порядок то, что обычно ведут сигналы.
+
+    Счётчики сверяет отдельная команда reconcile_counters.
+    Справочник ингредиентов сбрасывается после записи, а не из
+    транзакции пачки: иначе другой процесс успел бы перечитать его
+    без незакоммиченных ингредиентов под новой версией.
+    """
+    broken = list(find_inconsistent_users())
+    for start in range(0, len(broken), BATCH_SIZE):
+        rebuild(broken[start:start + BATCH_SIZE])
+    media.recount()
+    short_link_cache.invalidate()
+    ingredient_catalog.invalidate()
+    for user_id in user_ids:
+        relations.invalidate(user_id)
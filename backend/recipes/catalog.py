@@ -0,0 +1,170 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models import Count
+from foodgram.constants import INGREDIENT_SEARCH_LIMIT
+
+from .models import Ingredient
+
+VERSION_KEY = "recipes:ingredient_catalog_version"
+NGRAM_SIZE = 3
+
+
+def normalize(value):
+    """Приводит название к виду для поиска: нижний регистр, ё -> е."""
+    return value.strip().lower().replace("ё", "е")
+
+
+def ngrams(value):
+    return {
+        value[i:i + NGRAM_SIZE]
+        for i in range(len(value) - NGRAM_SIZE + 1)
+    }
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок справочника с поисковыми индексами.
+
+    Ингредиенты пронумерованы по рангу: сначала самые используемые
+    в рецептах, затем по алфавиту. Все списки в индексах хранят ранги
+    по возрастанию, поэтому обход индекса сразу идёт в порядке выдачи.
+    """
+
+    def __init__(self, version, ingredients, usage):
+        self.version = version
+        self.ingredients = tuple(sorted(ingredients, key=lambda x: x.name))
+        self.by_id = {item.id: item for item in ingredients}
+        self.by_name = {item.name: item for item in ingredients}
+
+        self.ranked = sorted(
+            ingredients,
+            key=lambda x: (-usage.get(x.id, 0), normalize(x.name))
+        )
+        self.names = [normalize(item.name) for item in self.ranked]
+
+        # Короткие префиксы (короче n-граммы) -> ранги.
+        self.short_prefixes = defaultdict(list)
+        # n-грамма -> ранги ингредиентов, в названии которых она есть.
+        self.ngrams = defaultdict(list)
+        for rank, name in enumerate(self.names):
+            for length in range(1, min(len(name), NGRAM_SIZE - 1) + 1):
+                self.short_prefixes[name[:length]].append(rank)
+            for gram in ngrams(name):
+                self.ngrams[gram].append(rank)
+
+        # Длинные префиксы ищутся бинарным поиском по отсортированным именам.
+        pairs = sorted((name, rank) for rank, name in enumerate(self.names))
+        self.sorted_names = [name for name, _ in pairs]
+        self.sorted_ranks = [rank for _, rank in pairs]
+
+    def prefix_ranks(self, query):
+        if len(query) < NGRAM_SIZE:
+            return self.short_prefixes.get(query, [])
+        start = bisect_left(self.sorted_names, query)
+        end = bisect_left(self.sorted_names, query + "\uffff", start)
+        return sorted(self.sorted_ranks[start:end])
+
+    def substring_ranks(self, query):
+        if len(query) < NGRAM_SIZE:
+            candidates = range(len(self.names))
+        else:
+            candidates = min(
+                (self.ngrams.get(gram, ()) for gram in ngrams(query)),
+                key=len,
+            )
+        for rank in candidates:
+            if query in self.names[rank]:
+                yield rank
+
+    def search(self, query, limit):
+        found = self.prefix_ranks(query)[:limit]
+        if len(found) < limit:
+            seen = set(found)
+            for rank in self.substring_ranks(query):
+                if rank not in seen:
+                    found.append(rank)
+                    if len(found) == limit:
+                        break
+        return [self.ranked[rank] for rank in found]
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+
+class IngredientCatalog:
+    """Справочник ингредиентов в памяти процесса.
+
+    Загружается при первом обращении и перечитывается, когда меняется
+    версия в общем кеше (см. invalidate).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def _current_version(self):
+        return cache.get_or_set(VERSION_KEY, lambda: uuid4().hex, None)
+
+    def _load(self):
+        version = self._current_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                # Частота использования считается в том же запросе:
+                # перезагрузка укладывается в бюджет в один запрос.
+                ingredients = list(Ingredient.objects.annotate(
+                    usage=Count("recipeingredients")
+                ))
+                snapshot = CatalogSnapshot(
+                    version, ingredients,
+                    {item.id: item.usage for item in ingredients},
+                )
+                self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self):
+        """Текущий снимок справочника.
+
+        Каждое обращение к справочнику сверяет версию в общем кеше,
+        то есть ходит в него по сети; код, которому нужно много
+        ингредиентов подряд, берёт снимок один раз.
+        """
+        return self._load()
+
+    @property
+    def version(self):
+        return self._load().version
+
+    def all(self):
+        return self._load().ingredients
+
+    def get(self, pk):
+        return self._load().by_id.get(pk)
+
+    def get_by_name(self, name):
+        return self._load().by_name.get(name)
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        """Автодополнение по названию без учёта регистра и ё/е.
+
+        Сначала идут ингредиенты, название которых начинается с query,
+        затем те, где query встречается внутри; внутри групп — по
+        частоте использования в рецептах и по алфавиту.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        return self._load().search(query, limit)
+
+    def invalidate(self):
+        """Сбрасывает справочник во всех процессах, использующих кеш."""
+        cache.set(VERSION_KEY, uuid4().hex, None)
+
+
+ingredient_catalog = IngredientCatalog()
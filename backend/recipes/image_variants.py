@@ -0,0 +1,224 @@
+import base64
+import io
+from collections import namedtuple
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from foodgram.constants import (IMAGE_JOB_MAX_ATTEMPTS, IMAGE_JOB_RETRY_DELAY,
+                                IMAGE_JOB_TIMEOUT, IMAGE_JPEG_QUALITY)
+from PIL import Image, ImageOps
+
+from .models import ImageVariantJob
+
+Target = namedtuple("Target", ("variants_field", "sizes"))
+
+# "app.Model.поле картинки" -> поле с вариантами и размеры вариантов
+# (имя, длинная сторона). Каждый размер готовится в формате оригинала
+# (JPEG или PNG для картинок с прозрачностью) и в WebP.
+TARGETS = {
+    "recipes.Recipe.image": Target(
+        "image_variants", (("detail", 1200), ("card", 480))
+    ),
+    "users.User.avatar": Target("avatar_variants", (("thumb", 160),)),
+}
+PLACEHOLDER_SIDE = 16
+PLACEHOLDER_QUALITY = 50
+WEBP_QUALITY = 80
+BATCH_SIZE = 1000
+
+
+def variant_names(target):
+    return [
+        variant
+        for name, _ in TARGETS[target].sizes
+        for variant in (name, f"{name}_webp")
+    ]
+
+
+def target_of(instance, field):
+    return f"{instance._meta.label}.{field}"
+
+
+def current_variants(instance, field):
+    """Готовые варианты текущей картинки или None."""
+    variants = getattr(
+        instance, TARGETS[target_of(instance, field)].variants_field
+    )
+    image = getattr(instance, field)
+    if image and variants.get("source") == image.name:
+        return variants
+    return None
+
+
+def enqueue(instance, field):
+    """Ставит задание, если варианты не соответствуют картинке."""
+    image = getattr(instance, field)
+    if not image or current_variants(instance, field) is not None:
+        return
+    ImageVariantJob.objects.bulk_create(
+        [ImageVariantJob(
+            target=target_of(instance, field),
+            object_id=instance.pk,
+            source=image.name,
+        )],
+        ignore_conflicts=True,
+    )
+
+
+def enqueue_stale():
+    """Ставит задания для всех картинок без актуальных вариантов."""
+    total = 0
+    for target, (variants_field, _) in TARGETS.items():
+        label, field = target.rsplit(".", 1)
+        objects = (
+            apps.get_model(label).objects.exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True})
+            .only("pk", field, variants_field).order_by("pk")
+        )
+        jobs = [
+            ImageVariantJob(
+                target=target,
+                object_id=instance.pk,
+                source=getattr(instance, field).name,
+            )
+            for instance in objects.iterator(chunk_size=BATCH_SIZE)
+            if current_variants(instance, field) is None
+        ]
+        ImageVariantJob.objects.bulk_create(
+            jobs, batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        total += len(jobs)
+    return total
+
+
+def _save(image, name, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def render(source, sizes):
+    """Готовит варианты картинки source, от крупного к мелкому.
+
+    Возвращает словарь {имя варианта: имя файла}, плюс source
+    и placeholder — крошечная копия в виде data URI.
+    """
+    with default_storage.open(source) as file:
+        image = Image.open(file)
+        if image.format == "JPEG":
+            side = max(side for _, side in sizes)
+            image.draft("RGB", (side, side))
+        image = ImageOps.exif_transpose(image)
+    transparent = (
+        image.mode in ("RGBA", "LA") or "transparency" in image.info
+    )
+    image = image.convert("RGBA" if transparent else "RGB")
+    image_format, extension = ("PNG", "png") if transparent else (
+        "JPEG", "jpg"
+    )
+
+    variants = {"source": source}
+    for name, side in sorted(sizes, key=lambda size: -size[1]):
+        image.thumbnail((side, side))
+        variants[name] = _save(
+            image, f"{name}.{extension}", image_format,
+            optimize=True, quality=IMAGE_JPEG_QUALITY,
+        )
+        variants[f"{name}_webp"] = _save(
+            image, f"{name}.webp", "WEBP", quality=WEBP_QUALITY
+        )
+    image.thumbnail((PLACEHOLDER_SIDE, PLACEHOLDER_SIDE))
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=PLACEHOLDER_QUALITY)
+    variants["placeholder"] = (
+        "data:image/jpeg;base64,"
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+    return variants
+
+
+def variant_files(variants):
+    """Имена файлов вариантов без source и placeholder."""
+    return [
+        name for key, name in variants.items()
+        if key not in ("source", "placeholder")
+    ]
+
+
+def process(job):
+    """Готовит варианты и сохраняет их, если картинка не сменилась.
+
+    Объект сохраняется через save(update_fields), чтобы сигналы
+    сбросили кеш ответов и ETag, а поля auto_now (updated_at) обновились.
+    Файлы прежних или ненужных вариантов удалит сборщик мусора
+    recipes.media, когда на них не останется ссылок.
+    """
+    label, field = job.target.rsplit(".", 1)
+    model = apps.get_model(label)
+    variants_field, sizes = TARGETS[job.target]
+    variants = render(job.source, sizes)
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(
+            pk=job.object_id
+        ).first()
+        if instance is None or getattr(instance, field).name != job.source:
+            # Объект удалён или картинку успели заменить.
+            return False
+        setattr(instance, variants_field, variants)
+        instance.save(update_fields=[variants_field] + [
+            model_field.name for model_field in model._meta.concrete_fields
+            if getattr(model_field, "auto_now", False)
+        ])
+    return True
+
+
+def claim():
+    """Берёт следующее задание из очереди или None.
+
+    Задание, которое выполняется дольше IMAGE_JOB_TIMEOUT, считается
+    брошенным упавшим воркером и выдаётся снова.
+    """
+    now = timezone.now()
+    queue = ImageVariantJob.objects.filter(
+        Q(status=ImageVariantJob.PENDING, run_after__lte=now)
+        | Q(
+            status=ImageVariantJob.RUNNING,
+            locked_at__lt=now - timedelta(seconds=IMAGE_JOB_TIMEOUT),
+        )
+    )
+    with transaction.atomic():
+        job = queue.select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        job.status = ImageVariantJob.RUNNING
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=("status", "locked_at", "attempts"))
+    return job
+
+
+def run(job):
+    """Выполняет задание: удаляет его при успехе, иначе откладывает."""
+    try:
+        process(job)
+    except Exception as error:
+        job.error = repr(error)
+        job.locked_at = None
+        if job.attempts >= IMAGE_JOB_MAX_ATTEMPTS:
+            job.status = ImageVariantJob.FAILED
+        else:
+            job.status = ImageVariantJob.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=IMAGE_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        job.save(update_fields=(
+            "error", "locked_at", "status", "run_after"
+        ))
+        return False
+    job.delete()
+    return True
@@ -0,0 +1,120 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .models import Recipe, ShortLinkClick
+
+logger = logging.getLogger(__name__)
+
+# Три параметра на строку: в SQLite не больше 999 параметров в запросе.
+BATCH_SIZE = 300
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def upsert(counts):
+    """Прибавляет счётчики {(recipe_id, hour): clicks} к сохранённым.
+
+    Один INSERT ... ON CONFLICT DO UPDATE на пачку: строка часа
+    создаётся при первом сбросе и дальше только увеличивается.
+    Переходы к уже удалённым рецептам отбрасываются.
+    """
+    existing = set(
+        Recipe.objects.filter(pk__in={pk for pk, _ in counts})
+        .values_list("pk", flat=True)
+    )
+    rows = [
+        (pk, connection.ops.adapt_datetimefield_value(hour), clicks)
+        for (pk, hour), clicks in counts.items()
+        if pk in existing
+    ]
+    quote = connection.ops.quote_name
+    table = quote(ShortLinkClick._meta.db_table)
+    count = quote("count")
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        values = ", ".join(["(%s, %s, %s)"] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"({quote('recipe_id')}, {quote('hour')}, {count}) "
+                f"VALUES {values} "
+                f"ON CONFLICT ({quote('recipe_id')}, {quote('hour')}) "
+                f"DO UPDATE SET {count} = {table}.{count} + "
+                f"excluded.{count}",
+                [value for row in batch for value in row],
+            )
+    return len(rows)
+
+
+class ClickBuffer:
+    """Счётчики переходов в памяти воркера.
+
+    record() только увеличивает счётчик под блокировкой. Фоновый
+    поток раз в interval секунд забирает накопленное и пишет в базу
+    одним upsert, поэтому при падении процесса теряется не больше
+    одного интервала. Поток запускается при первом переходе в каждом
+    процессе: после fork потоки родителя не наследуются.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def record(self, recipe_id):
+        with self._lock:
+            self._counts[(recipe_id, current_hour())] += 1
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(
+                    target=self._run, name="short-link-clicks", daemon=True
+                ).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            # Любая ошибка остановила бы поток, и переходы копились бы
+            # в памяти до конца процесса: пишем в лог и ждём следующего
+            # сброса.
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Ошибка при сбросе переходов по ссылкам")
+            finally:
+                try:
+                    connection.close()
+                except Exception:
+                    logger.exception("Не удалось закрыть соединение")
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+        try:
+            return upsert(counts)
+        except DatabaseError:
+            logger.exception("Не удалось сохранить переходы по ссылкам")
+            # Вернём счётчики в буфер до следующего сброса.
+            with self._lock:
+                self._counts.update(counts)
+            return 0
+
+    def pending(self):
+        with self._lock:
+            return sum(self._counts.values())
+
+
+click_buffer = ClickBuffer(settings.SHORT_LINK_CLICKS_FLUSH_INTERVAL)
+atexit.register(click_buffer.flush)
@@ -0,0 +1,107 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from recipes.models import Recipe
+from recipes.search import search_recipes
+from tqdm import tqdm
+
+User = get_user_model()
+
+DISHES = (
+    "борщ", "щи", "солянка", "плов", "пирог", "салат", "омлет", "суп",
+    "котлеты", "блины", "запеканка", "рагу", "пельмени", "каша", "уха",
+)
+INGREDIENTS = (
+    "картошка", "свёкла", "капуста", "морковь", "лук", "говядина",
+    "курица", "рыба", "грибы", "сметана", "творог", "яйца", "рис",
+    "гречка", "томаты", "сыр", "чеснок", "укроп", "яблоки", "тыква",
+)
+VERBS = (
+    "сварить", "обжарить", "нарезать", "запечь", "потушить", "смешать",
+    "посолить", "остудить", "натереть", "взбить",
+)
+QUERIES = ("борщ", "картошка", "пирог с капустой", "запечь тыкву", "уха")
+BATCH_SIZE = 10000
+
+
+def fake_recipe(author, rng):
+    dish = rng.choice(DISHES)
+    main = rng.choice(INGREDIENTS)
+    steps = " ".join(
+        f"{rng.choice(VERBS)} {rng.choice(INGREDIENTS)}."
+        for _ in range(rng.randint(3, 12))
+    )
+    return Recipe(
+        author=author,
+        name=f"{dish} {main}".capitalize(),
+        text=steps,
+        cooking_time=rng.randint(5, 180),
+        image="recipes/images/benchmark.jpg",
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark recipe full-text search against icontains on a synthetic "
+        "corpus. All generated rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            total = queryset.count()
+            list(queryset.values_list("id", flat=True)[:10])
+            timings.append(time.perf_counter() - started)
+        return total, min(timings) * 1000
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        with transaction.atomic():
+            author = User.objects.create(
+                username="benchmark_search",
+                email="benchmark_search@example.com",
+            )
+            started = time.perf_counter()
+            for start in tqdm(
+                range(0, kwargs["recipes"], BATCH_SIZE),
+                ncols=100, desc="Generating",
+            ):
+                size = min(BATCH_SIZE, kwargs["recipes"] - start)
+                Recipe.objects.bulk_create(
+                    fake_recipe(author, rng) for _ in range(size)
+                )
+            self.stdout.write(
+                f"Inserted {kwargs['recipes']} recipes with index "
+                f"maintenance in {time.perf_counter() - started:.1f} s"
+            )
+
+            recipes = Recipe.objects.filter(author=author)
+            self.stdout.write(
+                f"{'query':<20}{'matches':>10}{'index, ms':>12}"
+                f"{'icontains, ms':>16}"
+            )
+            for query in QUERIES:
+                total, indexed = self._measure(
+                    search_recipes(recipes, query), kwargs["repeat"]
+                )
+                _, scan = self._measure(
+                    recipes.filter(
+                        Q(name__icontains=query) | Q(text__icontains=query)
+                    ).order_by("-pub_date"),
+                    kwargs["repeat"],
+                )
+                self.stdout.write(
+                    f"{query:<20}{total:>10}{indexed:>12.1f}{scan:>16.1f}"
+                )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
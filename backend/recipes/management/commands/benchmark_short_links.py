@@ -0,0 +1,101 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from recipes import short_links
+from recipes.models import Recipe
+from recipes.short_link_cache import short_link_cache
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark short link redirects per second in one worker, with and "
+        "without the in-process link cache. All generated rows are rolled "
+        "back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000)
+        parser.add_argument("--requests", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def _measure(self, label, client, links):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for link in links:
+                client.get(f"/s/{link}/")
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label:<28}{len(links):>10}{len(links) / elapsed:>12.0f}"
+            f"{len(queries) / len(links):>14.2f}"
+        )
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        total = kwargs["requests"]
+        client = Client(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        max_entries = short_link_cache.max_entries
+        # Каждый неизвестный код пишет в лог предупреждение о 404.
+        request_logger = logging.getLogger("django.request")
+        log_level = request_logger.level
+        with transaction.atomic():
+            author = User.objects.create(
+                username="benchmark_short_links",
+                email="benchmark_short_links@example.com",
+            )
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f"Benchmark {index}",
+                    text="Benchmark",
+                    cooking_time=10,
+                    image="recipes/images/benchmark.jpg",
+                )
+                for index in range(kwargs["recipes"])
+            )
+            codes = [
+                short_links.encode(recipe.pk)
+                for recipe in Recipe.objects.filter(author=author)
+                .order_by("pk")
+            ]
+            # Вирусный трафик: популярность ссылок по закону Ципфа.
+            weights = [1 / rank for rank in range(1, len(recipes) + 1)]
+            burst = rng.choices(codes, weights=weights, k=total)
+            unknown = [
+                "".join(rng.choices(short_links.ALPHABET, k=len(code)))
+                for code in rng.choices(codes, k=total)
+            ]
+
+            if settings.DEBUG:
+                self.stdout.write(self.style.WARNING(
+                    "DEBUG is on: 404 responses render the technical page."
+                ))
+            self.stdout.write(
+                f"{'scenario':<28}{'requests':>10}{'req/s':>12}"
+                f"{'queries/req':>14}"
+            )
+            try:
+                request_logger.setLevel(logging.ERROR)
+                short_link_cache.max_entries = 0
+                short_link_cache.invalidate()
+                self._measure("no cache, burst", client, burst)
+                short_link_cache.max_entries = max_entries
+                short_link_cache.invalidate()
+                self._measure("cache, burst", client, burst)
+                self._measure("cache, unknown codes", client, unknown)
+                self._measure("cache, unknown codes again", client, unknown)
+            finally:
+                request_logger.setLevel(log_level)
+                short_link_cache.max_entries = max_entries
+                short_link_cache.invalidate()
+            self.stdout.write(f"Cache: {short_link_cache.stats()}")
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Benchmark data rolled back."))
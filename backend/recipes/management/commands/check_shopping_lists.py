@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from recipes.shopping_list import (BATCH_SIZE, find_inconsistent_users,
+                                   rebuild, user_batches)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check materialized shopping lists against the users' carts and "
+        "optionally rebuild them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="Rebuild the shopping lists that are out of sync",
+        )
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Rebuild every shopping list without checking",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["rebuild"]:
+            total = 0
+            for user_ids in user_batches():
+                rebuild(user_ids)
+                total += len(user_ids)
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt {total} shopping lists.")
+            )
+            return
+
+        broken = list(find_inconsistent_users())
+        if not broken:
+            self.stdout.write(self.style.SUCCESS("All shopping lists match."))
+            return
+        self.stdout.write(
+            f"{len(broken)} shopping lists are out of sync: "
+            + ", ".join(map(str, broken[:20]))
+            + (" ..." if len(broken) > 20 else "")
+        )
+        if kwargs["fix"]:
+            # Пачками, как --rebuild: одна транзакция на всех держала
+            # бы блокировки до конца пересчёта.
+            for start in range(0, len(broken), BATCH_SIZE):
+                rebuild(broken[start:start + BATCH_SIZE])
+            self.stdout.write(self.style.SUCCESS("Rebuilt."))
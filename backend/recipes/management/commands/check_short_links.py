@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes import short_links
+from recipes.models import Recipe
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that short link codes round-trip to recipe ids and that "
+        "stored legacy links still open their recipes"
+    )
+
+    def handle(self, *args, **kwargs):
+        broken = []
+        legacy = {}
+        total = 0
+        recipes = Recipe.objects.order_by().values_list("pk", "link")
+        for pk, link in recipes.iterator(chunk_size=BATCH_SIZE):
+            total += 1
+            if short_links.decode(short_links.encode(pk)) != pk:
+                broken.append(pk)
+            if link:
+                legacy[link] = pk
+        # Прежняя ссылка перекрыта, если совпадает с вычисленным кодом
+        # другого существующего рецепта: резолвер предпочтёт его.
+        decoded = {
+            link: short_links.decode(link) for link in legacy
+        }
+        existing = set(
+            Recipe.objects.filter(
+                pk__in=[pk for pk in decoded.values() if pk]
+            ).values_list("pk", flat=True)
+        )
+        shadowed = [
+            (link, legacy[link], pk) for link, pk in decoded.items()
+            if pk in existing and pk != legacy[link]
+        ]
+        self.stdout.write(
+            f"{total} recipes, {len(legacy)} legacy links"
+        )
+        for link, own, other in shadowed:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Legacy link {link} of recipe {own} now opens "
+                    f"recipe {other}"
+                )
+            )
+        if broken:
+            raise CommandError(
+                f"Codes do not round-trip for recipes: {broken[:20]}"
+            )
+        self.stdout.write(self.style.SUCCESS("Short links OK"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from recipes import media
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete uploaded files nothing refers to any more. Files stay for "
+        "MEDIA_GC_GRACE_PERIOD after their last upload"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recount", action="store_true",
+            help="Rebuild reference counts from the database first",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["recount"]:
+            total = media.recount()
+            self.stdout.write(f"Referenced files: {total}")
+        deleted = media.collect() + media.collect_untracked()
+        self.stdout.write(f"Deleted files: {deleted}")
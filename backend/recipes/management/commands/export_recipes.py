@@ -0,0 +1,60 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes import transfer
+
+READ_SIZE = 64 * 1024
+
+
+def last_record(file):
+    """Последняя целая строка файла; недописанный хвост обрезается."""
+    end = file.seek(0, os.SEEK_END)
+    tail = b""
+    while end and tail.count(b"\n") < 2:
+        start = max(end - READ_SIZE, 0)
+        file.seek(start)
+        tail = file.read(end - start) + tail
+        end = start
+    complete = tail.rfind(b"\n") + 1
+    file.truncate(end + complete)
+    lines = tail[:complete].splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Export users, recipes with ingredients, favorites, carts and "
+        "subscriptions as JSON Lines, streaming in id order"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file_path", type=str, help="Output file")
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Continue an interrupted export after its last full line",
+        )
+
+    def handle(self, *args, **kwargs):
+        file_path = kwargs["file_path"]
+        after = None
+        mode = "wb"
+        if kwargs["resume"] and os.path.exists(file_path):
+            with open(file_path, "rb+") as file:
+                record = last_record(file)
+            if record is not None:
+                after = (record["type"], record["id"])
+                self.stdout.write(f"Resuming after {after[0]} {after[1]}")
+            mode = "ab"
+        total = 0
+        try:
+            with open(file_path, mode) as file:
+                for record in transfer.export(after):
+                    file.write(
+                        json.dumps(record, ensure_ascii=False).encode()
+                        + b"\n"
+                    )
+                    total += 1
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f"Exported {total} records."))
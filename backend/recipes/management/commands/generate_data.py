@@ -0,0 +1,214 @@
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+from api.response_cache import bump_generation
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from recipes import bulk
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from users.models import Subscription
+
+User = get_user_model()
+
+CHUNK_SIZE = 10000
+DISHES = (
+    "суп", "салат", "пирог", "омлет", "рагу", "плов", "борщ", "гуляш",
+    "соус", "десерт", "пудинг", "шашлык", "гарнир", "бульон", "компот",
+)
+STYLES = (
+    "домашнему", "деревенски", "итальянски", "французски", "грузински",
+    "быстрому", "бабушкиному", "летнему", "праздничному", "восточному",
+)
+STEPS = (
+    "Промыть и обсушить продукты.",
+    "Нарезать овощи небольшими кубиками.",
+    "Разогреть сковороду с маслом.",
+    "Обжарить лук до золотистого цвета.",
+    "Добавить специи и перемешать.",
+    "Тушить под крышкой на медленном огне.",
+    "Довести до кипения и убавить огонь.",
+    "Запекать в разогретой духовке до готовности.",
+    "Посолить и поперчить по вкусу.",
+    "Дать настояться несколько минут.",
+    "Подавать горячим, посыпав зеленью.",
+    "Охладить перед подачей.",
+)
+IMAGES = (
+    "recipes/images/борщ.jpg", "recipes/images/гречка.jpg",
+    "recipes/images/омлет.jpg", "recipes/images/пюре.jpg",
+    "recipes/images/салат.jpeg",
+)
+
+
+def popularity(count):
+    """Веса по закону Ципфа: немногие авторы и рецепты популярнее всех."""
+    return [1 / rank for rank in range(1, count + 1)]
+
+
+def chunks(objects):
+    chunk = []
+    for obj in objects:
+        chunk.append(obj)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a seeded synthetic dataset for load testing: users, "
+        "recipes with ingredients, favorites, carts and subscriptions, "
+        "inserted in bulk. Generated users share the password "
+        "'benchmark'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument(
+            "--ingredients", type=int, nargs=2, default=(3, 12),
+            metavar=("MIN", "MAX"), help="Ingredients per recipe",
+        )
+        parser.add_argument("--favorites", type=int, default=50000)
+        parser.add_argument("--carts", type=int, default=5000)
+        parser.add_argument("--subscriptions", type=int, default=10000)
+        parser.add_argument("--prefix", default="synthetic")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def insert(self, label, model, objects):
+        started = time.perf_counter()
+        total = 0
+        for chunk in chunks(objects):
+            with transaction.atomic(), bulk.keep_timestamps(model):
+                bulk.insert(model, chunk)
+            total += len(chunk)
+        self.stdout.write(
+            f"{label:<20}{total:>10}"
+            f"{time.perf_counter() - started:>10.1f} s"
+        )
+
+    def create_users(self, prefix, count):
+        password = make_password("benchmark")
+        now = timezone.now()
+        usernames = [f"{prefix}{index}" for index in range(count)]
+        self.insert("users", User, (
+            User(
+                username=username,
+                email=f"{username}@example.com",
+                first_name="Имя",
+                last_name="Фамилия",
+                password=password,
+                date_joined=now,
+            )
+            for username in usernames
+        ))
+        user_ids = []
+        for start in range(0, count, CHUNK_SIZE):
+            user_ids += User.objects.filter(
+                username__in=usernames[start:start + CHUNK_SIZE]
+            ).order_by("pk").values_list("pk", flat=True)
+        return user_ids
+
+    def generate_recipes(self, rng, user_ids, count, first_id):
+        now = timezone.now()
+        authors = rng.choices(user_ids, popularity(len(user_ids)), k=count)
+        for offset, author_id in enumerate(authors):
+            published = now - timedelta(
+                seconds=rng.randint(0, 365 * 24 * 60 * 60)
+            )
+            yield Recipe(
+                id=first_id + offset,
+                author_id=author_id,
+                name=(
+                    f"{rng.choice(DISHES).capitalize()} "
+                    f"по-{rng.choice(STYLES)}"
+                ),
+                text=" ".join(rng.choices(STEPS, k=rng.randint(3, 8))),
+                cooking_time=rng.randint(5, 180),
+                image=rng.choice(IMAGES),
+                pub_date=published,
+                updated_at=published,
+            )
+
+    def generate_ingredients(self, rng, recipe_ids, ingredient_ids, limits):
+        for recipe_id in recipe_ids:
+            for ingredient_id in rng.sample(
+                ingredient_ids, rng.randint(*limits)
+            ):
+                yield RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.choice((1, 2, 5, 10, 50, 100, 200, 500)),
+                )
+
+    def generate_pairs(self, rng, owners, targets, total, make):
+        """total пар без повторов: по выборке целей на каждого владельца.
+
+        Число пар на владельца распределено по Ципфу, поэтому есть и
+        «тяжёлые» пользователи с длинными списками.
+        """
+        per_owner = Counter(
+            rng.choices(owners, popularity(len(owners)), k=total)
+        )
+        for owner, count in per_owner.items():
+            # Одна лишняя цель на случай, если выпадет сам владелец.
+            sample = rng.sample(targets, min(count + 1, len(targets)))
+            for target in [pk for pk in sample if pk != owner][:count]:
+                yield make(owner, target)
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        ingredient_ids = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        low, high = kwargs["ingredients"]
+        if not 0 < low <= high <= len(ingredient_ids):
+            raise CommandError(
+                "Load ingredients first (load_data) and check --ingredients."
+            )
+        if kwargs["users"] < 2:
+            raise CommandError("Generate at least two users.")
+
+        user_ids = self.create_users(kwargs["prefix"], kwargs["users"])
+        first_id = (Recipe.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        recipe_ids = range(first_id, first_id + kwargs["recipes"])
+        self.insert("recipes", Recipe, self.generate_recipes(
+            rng, user_ids, kwargs["recipes"], first_id
+        ))
+        bulk.reset_sequences(Recipe)
+        self.insert("recipe ingredients", RecipeIngredient, (
+            self.generate_ingredients(
+                rng, recipe_ids, ingredient_ids, (low, high)
+            )
+        ))
+        self.insert("favorites", Favorite, self.generate_pairs(
+            rng, user_ids, recipe_ids, kwargs["favorites"],
+            lambda user, recipe: Favorite(user_id=user, recipe_id=recipe),
+        ))
+        self.insert("carts", ShoppingCart, self.generate_pairs(
+            rng, user_ids, recipe_ids, kwargs["carts"],
+            lambda user, recipe: ShoppingCart(
+                user_id=user, recipe_id=recipe
+            ),
+        ))
+        self.insert("subscriptions", Subscription, self.generate_pairs(
+            rng, user_ids, user_ids, kwargs["subscriptions"],
+            lambda user, author: Subscription(
+                subscriber_id=user, author_id=author
+            ),
+        ))
+
+        call_command("reconcile_counters", stdout=self.stdout)
+        bulk.refresh_derived(user_ids)
+        bump_generation()
+        self.stdout.write(self.style.SUCCESS("Synthetic data generated."))
@@ -0,0 +1,134 @@
+import json
+import os
+from collections import Counter
+
+from api.response_cache import bump_generation
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from recipes import bulk, transfer
+from recipes.models import Recipe
+
+BATCH_SIZE = 1000
+# Начало строки рецепта в файле export_recipes.
+RECIPE_PREFIX = b'{"type": "recipe"'
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a JSON Lines file made by export_recipes. Records are "
+        "inserted in batches (COPY on PostgreSQL), existing ones are "
+        "skipped; progress is saved after every batch, so a rerun "
+        "continues where a crashed import stopped. Recipes whose id is "
+        "taken by another recipe get a new id, and favorites and carts "
+        "follow them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file_path", type=str, help="Path to the file")
+        parser.add_argument(
+            "--restart", action="store_true",
+            help="Ignore saved progress and read the file from the start",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def save_progress(self, path, content):
+        # Через временный файл: прогресс не потеряется при падении
+        # посреди записи.
+        with open(f"{path}.tmp", "w") as file:
+            file.write(content)
+        os.replace(f"{path}.tmp", path)
+
+    def load_recipe_ids(self, path):
+        """Карта id рецептов из прерванного импорта; ключи JSON — строки."""
+        if not os.path.exists(path):
+            return {}
+        with open(path) as file:
+            return {
+                int(source): target
+                for source, target in json.load(file).items()
+            }
+
+    def last_recipe_id(self, file_path):
+        """Наибольший id рецепта в файле: один проход без разбора связей."""
+        last_id = 0
+        with open(file_path, "rb") as file:
+            for line in file:
+                if line.startswith(RECIPE_PREFIX):
+                    last_id = max(last_id, json.loads(line)["id"])
+        return last_id
+
+    def handle(self, *args, **kwargs):
+        file_path = kwargs["file_path"]
+        progress_path = f"{file_path}.progress"
+        # Id рецептов, которые в этой базе пришлось сменить: нужны
+        # связям из следующих пачек, в том числе после перезапуска.
+        recipe_ids_path = f"{file_path}.recipe_ids"
+        offset = 0
+        saved_ids = {}
+        if not kwargs["restart"] and os.path.exists(progress_path):
+            with open(progress_path) as file:
+                offset = int(file.read())
+            saved_ids = self.load_recipe_ids(recipe_ids_path)
+            self.stdout.write(f"Resuming at byte {offset}")
+        totals = Counter()
+        users = set()
+
+        def flush(kind, records, position):
+            mapped = len(recipe_ids)
+            users.update(transfer.import_batch(kind, records, recipe_ids))
+            totals[kind] += len(records)
+            if len(recipe_ids) != mapped:
+                self.save_progress(recipe_ids_path, json.dumps(recipe_ids))
+            self.save_progress(progress_path, str(position))
+
+        try:
+            recipe_ids = transfer.RecipeIds(
+                saved_ids, last_source_id=self.last_recipe_id(file_path)
+            )
+            with open(file_path, "rb") as file:
+                file.seek(offset)
+                kind, records = None, []
+                for line in iter(file.readline, b""):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["type"] not in transfer.IMPORTERS:
+                        raise CommandError(
+                            f"Unknown record type: {record['type']}"
+                        )
+                    if records and (
+                        record["type"] != kind
+                        or len(records) == kwargs["batch_size"]
+                    ):
+                        flush(kind, records, offset)
+                        records = []
+                    kind = record["type"]
+                    records.append(record)
+                    offset += len(line)
+                if records:
+                    flush(kind, records, offset)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        bulk.reset_sequences(Recipe)
+        call_command("reconcile_counters", stdout=self.stdout)
+        bulk.refresh_derived(users)
+        bump_generation()
+        for path in (progress_path, recipe_ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+        moved = sum(target is not None for target in recipe_ids.values())
+        skipped = len(recipe_ids) - moved
+        if moved or skipped:
+            self.stderr.write(self.style.WARNING(
+                f"{moved} recipes are stored under new ids because theirs "
+                f"were taken (their short links changed); {skipped} were "
+                "skipped: unknown author, an ingredient stored here with "
+                "another unit, or a conflicting row. Favorites and carts "
+                "were remapped accordingly."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            "Processed records: " + ", ".join(
+                f"{count} {kind}" for kind, count in totals.items()
+            )
+        ))
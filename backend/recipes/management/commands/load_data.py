@@ -1,31 +1,170 @@
+import csv
 import json
+import os
+import re
 
-from django.core.management.base import BaseCommand
+from api.response_cache import bump_generation
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from foodgram.constants import MAX_LENGTH_RECIPE
+from recipes.catalog import ingredient_catalog
 from recipes.models import Ingredient
 from tqdm import tqdm
 
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+WHITESPACE_RE = re.compile(r"[\s,]*")
+CSV_HEADER = ["name", "measurement_unit"]
+
+
+def read_json(file):
+    """Элементы JSON-массива по одному, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("Expected a JSON array of ingredients")
+    position = 1
+    end_of_file = False
+    while True:
+        position = WHITESPACE_RE.match(buffer, position).end()
+        if buffer.startswith("]", position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as error:
+            if end_of_file:
+                raise CommandError(f"Invalid JSON: {error}")
+            chunk = file.read(READ_SIZE)
+            end_of_file = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        if isinstance(item, dict):
+            yield item.get("name"), item.get("measurement_unit")
+        else:
+            yield None, None
+
+
+def read_csv(file):
+    """Строки CSV «название,единица»; строка заголовка необязательна."""
+    for number, row in enumerate(csv.reader(file)):
+        if number == 0 and row == CSV_HEADER:
+            continue
+        yield tuple(row) if len(row) == 2 else (None, None)
+
+
+READERS = {".json": read_json, ".csv": read_csv}
+
+
+def clean(name, measurement_unit):
+    if not isinstance(name, str) or not isinstance(measurement_unit, str):
+        return None
+    name, measurement_unit = name.strip(), measurement_unit.strip()
+    if not (
+        0 < len(name) <= MAX_LENGTH_RECIPE
+        and 0 < len(measurement_unit) <= MAX_LENGTH_RECIPE
+    ):
+        return None
+    return name, measurement_unit
+
 
 class Command(BaseCommand):
-    help = "Load ingredients from a JSON file"
+    help = (
+        "Load ingredients from a JSON or CSV file. Rows are upserted by "
+        "name in batches; existing ingredients are never deleted"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("file_path", type=str, help="Path to the file")
+        parser.add_argument(
+            "--format", choices=("json", "csv"),
+            help="File format; detected from the extension by default",
+        )
+        parser.add_argument(
+            "--keep-existing", action="store_true",
+            help="Skip ingredients that exist with another unit "
+                 "instead of updating the unit",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def load_batch(self, batch, keep_existing):
+        """Вставляет новые и обновляет изменённые ингредиенты пачки.
+
+        Один запрос читает существующие (для отчёта), второй
+        вставляет и обновляет всё сразу: INSERT ... ON CONFLICT (name)
+        DO UPDATE. Повтор строки внутри пачки не считается изменением:
+        побеждает последняя.
+        """
+        rows = dict(batch)
+        counts = {"skipped": len(batch) - len(rows)}
+        with transaction.atomic():
+            existing = dict(
+                Ingredient.objects.filter(name__in=list(rows))
+                .values_list("name", "measurement_unit")
+            )
+            new = [name for name in rows if name not in existing]
+            changed = [
+                name for name, measurement_unit in existing.items()
+                if measurement_unit != rows[name] and not keep_existing
+            ]
+            objects = [
+                Ingredient(name=name, measurement_unit=rows[name])
+                for name in new + changed
+            ]
+            # Конфликт возможен и для «новых»: параллельная загрузка
+            # могла успеть вставить ту же строку.
+            if keep_existing:
+                Ingredient.objects.bulk_create(objects, ignore_conflicts=True)
+            else:
+                Ingredient.objects.bulk_create(
+                    objects,
+                    update_conflicts=True,
+                    unique_fields=["name"],
+                    update_fields=["measurement_unit"],
+                )
+        counts["inserted"] = len(new)
+        counts["updated"] = len(changed)
+        counts["skipped"] += len(existing) - len(changed)
+        return counts
+
+    def add_counts(self, totals, batch, kwargs):
+        counts = self.load_batch(batch, kwargs["keep_existing"])
+        for key, value in counts.items():
+            totals[key] += value
 
     def handle(self, *args, **kwargs):
         file_path = kwargs["file_path"]
+        extension = (
+            f".{kwargs['format']}" if kwargs["format"]
+            else os.path.splitext(file_path)[1].lower()
+        )
+        if extension not in READERS:
+            raise CommandError("Use a .json or .csv file or pass --format")
+        totals = {"inserted": 0, "updated": 0, "skipped": 0, "invalid": 0}
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-
-            Ingredient.objects.all().delete()
-            for item in tqdm(data, ncols=100, desc="Loading"):
-                name = item.get("name")
-                measurement_unit = item.get("measurement_unit")
-
-                if name and measurement_unit:
-                    Ingredient.objects.get_or_create(
-                        name=name, measurement_unit=measurement_unit
-                    )
-            self.stdout.write(self.style.SUCCESS("Loaded successfully!"))
-        except Exception as error:
-            self.stderr.write(self.style.ERROR(f"Error: {error}"))
+            with open(file_path, "r", encoding="utf-8", newline="") as file:
+                rows = tqdm(
+                    READERS[extension](file), ncols=100, desc="Loading",
+                    unit=" rows",
+                )
+                batch = []
+                for row in rows:
+                    row = clean(*row)
+                    if row is None:
+                        totals["invalid"] += 1
+                        continue
+                    batch.append(row)
+                    if len(batch) == kwargs["batch_size"]:
+                        self.add_counts(totals, batch, kwargs)
+                        batch = []
+                if batch:
+                    self.add_counts(totals, batch, kwargs)
+        except OSError as error:
+            raise CommandError(error)
+        finally:
+            ingredient_catalog.invalidate()
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            "Loaded: {inserted} inserted, {updated} updated, "
+            "{skipped} skipped, {invalid} invalid".format(**totals)
+        ))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from recipes import image_variants
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker for the image variant queue: prepares thumbnails, WebP "
+        "copies and placeholders for uploaded recipe images and avatars"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit when the queue is empty",
+        )
+        parser.add_argument(
+            "--backfill", action="store_true",
+            help="Queue every image without up-to-date variants first",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=2.0,
+            help="Seconds to wait while the queue is empty",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["backfill"]:
+            total = image_variants.enqueue_stale()
+            self.stdout.write(f"Queued {total} images")
+        while True:
+            close_old_connections()
+            job = image_variants.claim()
+            if job is None:
+                if kwargs["once"]:
+                    break
+                time.sleep(kwargs["sleep"])
+                continue
+            started = time.perf_counter()
+            if image_variants.run(job):
+                self.stdout.write(
+                    f"{job}: done in "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms"
+                )
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"{job}: {job.status}, attempt {job.attempts}: "
+                    f"{job.error}"
+                ))
@@ -0,0 +1,58 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+# (модель, поле счётчика, модель связи, внешний ключ на счётную модель)
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "subscribers_count", Subscription, "author"),
+)
+BATCH_SIZE = 1000
+
+
+def actual_count(related_model, field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(**{field: OuterRef("pk")})
+            .order_by().values(field)
+            .annotate(total=Count("pk")).values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Recount stored favorites/recipes/subscribers counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report counters that drifted",
+        )
+
+    def handle(self, *args, **kwargs):
+        for model, counter, related_model, field in COUNTERS:
+            actual = actual_count(related_model, field)
+            drifted = list(
+                model.objects.annotate(actual=actual)
+                .exclude(**{counter: F("actual")})
+                .values_list("pk", flat=True)
+            )
+            label = f"{model.__name__}.{counter}"
+            if not drifted:
+                self.stdout.write(f"{label}: OK")
+                continue
+            self.stdout.write(f"{label}: {len(drifted)} rows drifted")
+            if kwargs["dry_run"]:
+                continue
+            for start in range(0, len(drifted), BATCH_SIZE):
+                model.objects.filter(
+                    pk__in=drifted[start:start + BATCH_SIZE]
+                ).update(**{counter: actual})
+            self.stdout.write(self.style.SUCCESS(f"{label}: fixed"))
@@ -0,0 +1,194 @@
+import os
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from foodgram.constants import MEDIA_GC_GRACE_PERIOD
+
+from . import image_variants
+from .models import StoredFile
+from .storage import CONTENT_DIR
+
+BATCH_SIZE = 1000
+
+
+def _fields(model):
+    """Поля с картинками модели и поля с их вариантами."""
+    return [
+        (target.rsplit(".", 1)[1], variants_field)
+        for target, (variants_field, _) in image_variants.TARGETS.items()
+        if target.rsplit(".", 1)[0] == model._meta.label
+    ]
+
+
+def references(instance):
+    """Файлы хранилища, на которые ссылается объект.
+
+    Варианты считаются, только пока они соответствуют картинке:
+    при замене картинки старые варианты сразу остаются без ссылки.
+    """
+    names = Counter()
+    for field, _ in _fields(type(instance)):
+        image = getattr(instance, field)
+        if image:
+            names[image.name] += 1
+        variants = image_variants.current_variants(instance, field)
+        if variants is not None:
+            names.update(image_variants.variant_files(variants))
+    return names
+
+
+def remember(instance):
+    """Запоминает ссылки объекта, загруженного из базы.
+
+    Если поля с картинками отложены (only/defer), ссылки неизвестны:
+    их прочитает load перед сохранением или удалением.
+    """
+    fields = {name for pair in _fields(type(instance)) for name in pair}
+    if fields & instance.get_deferred_fields():
+        instance._media_references = None
+    else:
+        instance._media_references = references(instance)
+
+
+def load(instance):
+    """Читает ссылки из базы, если remember их не узнал."""
+    if instance._state.adding or instance._media_references is not None:
+        return
+    stored = type(instance)._base_manager.filter(pk=instance.pk).first()
+    instance._media_references = (
+        Counter() if stored is None else stored._media_references
+    )
+
+
+def _adjust(deltas):
+    by_delta = defaultdict(list)
+    for name, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(name)
+    for delta, names in by_delta.items():
+        StoredFile.objects.filter(name__in=names).update(
+            references=Greatest(F("references") + delta, Value(0))
+        )
+
+
+def _release(names):
+    if names:
+        transaction.on_commit(lambda: collect(names))
+
+
+def update(instance, created):
+    """Переносит в счётчики разницу ссылок после сохранения."""
+    old = Counter() if created else instance._media_references
+    new = references(instance)
+    instance._media_references = new
+    if old is None:
+        return
+    deltas = Counter(new)
+    deltas.subtract(old)
+    _adjust(deltas)
+    _release([name for name, delta in deltas.items() if delta < 0])
+
+
+def release(instance):
+    """Снимает ссылки удалённого объекта."""
+    names = instance._media_references or Counter()
+    _adjust({name: -count for name, count in names.items()})
+    _release(list(names))
+
+
+def collect(names=None):
+    """Удаляет файлы без ссылок; names ограничивает проверку.
+
+    Строка блокируется и удаляется вместе с файлом, поэтому загрузка
+    того же содержимого либо успеет отметить used_at, либо запишет
+    файл заново.
+    """
+    deadline = timezone.now() - timedelta(seconds=MEDIA_GC_GRACE_PERIOD)
+    garbage = StoredFile.objects.filter(references=0, used_at__lt=deadline)
+    if names is not None:
+        garbage = garbage.filter(name__in=names)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                garbage.select_for_update(skip_locked=True)
+                .values_list("pk", "name")[:BATCH_SIZE]
+            )
+            if not batch:
+                return deleted
+            for _, name in batch:
+                default_storage.delete(name)
+            StoredFile.objects.filter(
+                pk__in=[pk for pk, _ in batch]
+            ).delete()
+        deleted += len(batch)
+
+
+def collect_untracked():
+    """Удаляет из content/ файлы, для которых нет строки StoredFile.
+
+    Такие остаются, если запрос записал файл и откатил транзакцию.
+    """
+    root = default_storage.path(CONTENT_DIR)
+    deadline = (
+        timezone.now() - timedelta(seconds=MEDIA_GC_GRACE_PERIOD)
+    ).timestamp()
+    deleted = 0
+    for directory, _, files in os.walk(root):
+        names = {
+            os.path.relpath(
+                os.path.join(directory, file), default_storage.location
+            )
+            for file in files
+        }
+        known = set(
+            StoredFile.objects.filter(name__in=names)
+            .values_list("name", flat=True)
+        )
+        for name in names - known:
+            if os.path.getmtime(default_storage.path(name)) < deadline:
+                default_storage.delete(name)
+                deleted += 1
+    return deleted
+
+
+def recount():
+    """Пересчитывает ссылки по всем объектам с картинками.
+
+    Нужен один раз после включения счётчиков и после загрузки
+    фикстур: loaddata сохраняет объекты без сигналов о ссылках.
+    """
+    counts = Counter()
+    models = {
+        apps.get_model(target.rsplit(".", 1)[0])
+        for target in image_variants.TARGETS
+    }
+    for model in models:
+        fields = [name for pair in _fields(model) for name in pair]
+        for instance in model.objects.only("pk", *fields).iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            counts.update(instance._media_references)
+    StoredFile.objects.bulk_create(
+        [StoredFile(name=name) for name in counts],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    with transaction.atomic():
+        changed = []
+        for stored in StoredFile.objects.select_for_update().iterator(
+            chunk_size=BATCH_SIZE
+        ):
+            if stored.references != counts[stored.name]:
+                stored.references = counts[stored.name]
+                changed.append(stored)
+        StoredFile.objects.bulk_update(
+            changed, ["references"], batch_size=BATCH_SIZE
+        )
+    return len(counts)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_recipe_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date", "id"], name="recipe_pub_date_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by().values(field)
+            .annotate(total=Count("pk")).values("total")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Favorite = apps.get_model("recipes", "Favorite")
+    Recipe = apps.get_model("recipes", "Recipe")
+    User = apps.get_model("users", "User")
+    Recipe.objects.update(favorites_count=_count(Favorite, "recipe"))
+    User.objects.update(recipes_count=_count(Recipe, "author"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_user_recipes_count_user_subscribers_count"),
+        ("recipes", "0006_shoppinglistitem"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Добавления в избранное",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
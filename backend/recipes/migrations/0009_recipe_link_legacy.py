@@ -0,0 +1,34 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+def clear_blank_links(apps, schema_editor):
+    # Коды рецептов теперь вычисляются из id. Сохранённые ссылки
+    # остаются как есть, чтобы уже разосланные адреса открывались;
+    # пустые строки не являются ссылками и заменяются на NULL.
+    Recipe = apps.get_model("recipes", "Recipe")
+    Recipe.objects.filter(link="").update(link=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0008_recipe_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="link",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=10,
+                null=True,
+                unique=True,
+                verbose_name="Прежняя короткая ссылка",
+            ),
+        ),
+        migrations.RunPython(clear_blank_links, migrations.RunPython.noop),
+    ]
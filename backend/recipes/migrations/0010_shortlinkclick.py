@@ -0,0 +1,55 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0009_recipe_link_legacy"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShortLinkClick",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hour", models.DateTimeField(verbose_name="Час")),
+                (
+                    "count",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="Переходы"
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="recipes.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Переходы по короткой ссылке",
+                "verbose_name_plural": "Переходы по коротким ссылкам",
+                "ordering": ("-hour",),
+                "default_related_name": "short_link_clicks",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="shortlinkclick",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "hour"), name="unique_recipe_click_hour"
+            ),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0010_shortlinkclick"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                verbose_name="Варианты картинки",
+            ),
+        ),
+        migrations.CreateModel(
+            name="ImageVariantJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "target",
+                    models.CharField(
+                        max_length=64, verbose_name="Поле с картинкой"
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.PositiveBigIntegerField(verbose_name="Объект"),
+                ),
+                (
+                    "source",
+                    models.CharField(max_length=255, verbose_name="Картинка"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает"),
+                            ("running", "Выполняется"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Попытки"
+                    ),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Не раньше",
+                    ),
+                ),
+                (
+                    "locked_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Взято в работу"
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(blank=True, verbose_name="Ошибка"),
+                ),
+            ],
+            options={
+                "verbose_name": "Задание на варианты картинки",
+                "verbose_name_plural": "Задания на варианты картинок",
+                "ordering": ("id",),
+                "indexes": [
+                    models.Index(
+                        fields=["status", "run_after"],
+                        name="image_job_queue_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="imagevariantjob",
+            constraint=models.UniqueConstraint(
+                fields=("target", "object_id", "source"),
+                name="unique_image_variant_job",
+            ),
+        ),
+    ]
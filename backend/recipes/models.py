@@ -1,12 +1,13 @@
-import random
-import string
-
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from foodgram.constants import (LENGTH_SHORT_LINK, MAX_INGREDIENT,
-                                MAX_LENGTH_LINK, MAX_LENGTH_RECIPE,
-                                MIN_COOKING_TIME, MIN_INGREDIENT)
+from django.db import models, transaction
+from django.utils import timezone
+from foodgram.constants import (MAX_INGREDIENT, MAX_LENGTH_LINK,
+                                MAX_LENGTH_RECIPE, MIN_COOKING_TIME,
+                                MIN_INGREDIENT)
+from users.models import CountedModel
+
+from . import short_links
 
 User = get_user_model()
 
@@ -25,6 +26,12 @@ class PublishedModel(models.Model):
         abstract = True
         ordering = ("user",)
 
+    def save(self, *args, **kwargs):
+        # Счётчики и список покупок меняются сигналами в той же
+        # транзакции, что и сама запись.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """Ингредиент."""
@@ -51,7 +58,7 @@ class Ingredient(models.Model):
         return f"{self.name}, {self.measurement_unit}"
 
 
-class Recipe(models.Model):
+class Recipe(CountedModel):
     """Рецепт."""
 
     author = models.ForeignKey(
@@ -77,41 +84,64 @@ class Recipe(models.Model):
             )
         ],
     )
+    # Случайный код, выданный до перехода на short_links. Новым рецептам
+    # не заполняется, старые ссылки продолжают открываться по нему.
     link = models.CharField(
         max_length=MAX_LENGTH_LINK,
         unique=True,
         blank=True,
         null=True,
-        verbose_name="Ссылка",
+        editable=False,
+        verbose_name="Прежняя короткая ссылка",
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Дата публикации"
     )
+    # Версия строки для ETag/Last-Modified: меняется при каждом
+    # сохранении рецепта и при изменении профиля автора.
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения"
+    )
     image = models.ImageField(
         upload_to="images/",
         verbose_name="Картинка"
     )
+    # Уменьшенные копии картинки, которые готовит process_image_jobs.
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name="Варианты картинки",
+    )
     text = models.TextField(verbose_name="Описание")
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Добавления в избранное"
+    )
+
+    counter_fields = ("favorites_count",)
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         default_related_name = "recipes"
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=("-pub_date", "id"), name="recipe_pub_date_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
-    def generate_link(self):
-        length = LENGTH_SHORT_LINK
-        chars = string.ascii_letters
+    def save(self, *args, **kwargs):
+        # Счётчик рецептов автора меняется сигналом в той же транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-        while True:
-            self.link = "".join(random.choices(chars, k=length))
-            if not Recipe.objects.filter(link=self.link).exists():
-                break
-        return self.link
+    @property
+    def short_code(self):
+        return short_links.encode(self.pk)
 
 
 class RecipeIngredient(models.Model):
@@ -186,3 +216,147 @@ class ShoppingCart(PublishedModel):
 
     def __str__(self):
         return f"{self.user}"
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в корзине пользователя.
+
+    Материализованный список покупок: ведётся в recipes.shopping_list
+    при изменении корзины и состава рецептов.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, verbose_name="Пользователь"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, verbose_name="Ингредиент"
+    )
+    amount = models.PositiveBigIntegerField(verbose_name="Количество")
+
+    class Meta:
+        verbose_name = "Позиция списка покупок"
+        verbose_name_plural = "Позиции списка покупок"
+        default_related_name = "shopping_list_items"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_shopping_list_ingredient"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient_id} x {self.amount}"
+
+
+class ShortLinkClick(models.Model):
+    """Переходы по короткой ссылке рецепта за час.
+
+    Счётчики копятся в памяти воркеров и сбрасываются пачкой
+    (recipes.link_clicks), поэтому отстают не больше чем на интервал
+    сброса.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name="Рецепт"
+    )
+    hour = models.DateTimeField(verbose_name="Час")
+    count = models.PositiveBigIntegerField(
+        default=0, verbose_name="Переходы"
+    )
+
+    class Meta:
+        verbose_name = "Переходы по короткой ссылке"
+        verbose_name_plural = "Переходы по коротким ссылкам"
+        default_related_name = "short_link_clicks"
+        ordering = ("-hour",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "hour"], name="unique_recipe_click_hour"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} @ {self.hour:%Y-%m-%d %H:00}: {self.count}"
+
+
+class ImageVariantJob(models.Model):
+    """Задание на подготовку уменьшенных копий картинки.
+
+    Очередь в базе: задания создаются после загрузки картинки
+    и разбираются командой process_image_jobs.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "Ожидает"),
+        (RUNNING, "Выполняется"),
+        (FAILED, "Ошибка"),
+    )
+
+    target = models.CharField(
+        max_length=64, verbose_name="Поле с картинкой"
+    )
+    object_id = models.PositiveBigIntegerField(verbose_name="Объект")
+    source = models.CharField(max_length=255, verbose_name="Картинка")
+    status = models.CharField(
+        max_length=16, choices=STATUSES, default=PENDING,
+        verbose_name="Статус",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Попытки"
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now, verbose_name="Не раньше"
+    )
+    locked_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Взято в работу"
+    )
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+
+    class Meta:
+        verbose_name = "Задание на варианты картинки"
+        verbose_name_plural = "Задания на варианты картинок"
+        ordering = ("id",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["target", "object_id", "source"],
+                name="unique_image_variant_job"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=("status", "run_after"), name="image_job_queue_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.target}:{self.object_id} {self.source}"
+
+
+class StoredFile(models.Model):
+    """Файл хранилища и число ссылок на него из базы.
+
+    Строка появляется при записи файла (recipes.storage), счётчик
+    ведут сигналы (recipes.media). Файл без ссылок удаляется сборщиком
+    мусора, если к нему не обращались дольше MEDIA_GC_GRACE_PERIOD.
+    """
+
+    name = models.CharField(
+        max_length=255, unique=True, verbose_name="Имя файла"
+    )
+    references = models.PositiveIntegerField(
+        default=0, verbose_name="Ссылки"
+    )
+    used_at = models.DateTimeField(
+        default=timezone.now, verbose_name="Последняя загрузка"
+    )
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+        ordering = ("name",)
+
+    def __str__(self):
+        return f"{self.name}: {self.references}"
@@ -0,0 +1,180 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+WORD_RE = re.compile(r"\w+")
+# Грубое отсечение русских окончаний: в FTS5 нет морфологии, поэтому
+# слово ищется как префикс по основе («картошка» найдёт «картошку»).
+ENDING_RE = re.compile(
+    r"(?:ами|ями|ого|его|ому|ему|ыми|ими|ой|ей|ий|ый|ая|яя|ое|ее|ые|ие"
+    r"|ов|ев|ах|ях|ам|ям|ом|ем|а|я|о|е|ы|и|у|ю|ь|й)$"
+)
+MIN_STEM_LENGTH = 4
+
+POSTGRES_INDEX = (
+    """
+    ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector
+    tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(text, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector
+    ON recipes_recipe USING GIN (search_vector)
+    """,
+)
+POSTGRES_DROP_INDEX = (
+    "DROP INDEX IF EXISTS recipes_recipe_search_vector",
+    "ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector",
+)
+
+SQLITE_TABLE = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5(
+        name, text, content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+)
+SQLITE_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+)
+SQLITE_REBUILD = (
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP_INDEX = (
+    "DROP TRIGGER IF EXISTS recipes_recipe_fts_insert",
+    "DROP TRIGGER IF EXISTS recipes_recipe_fts_delete",
+    "DROP TRIGGER IF EXISTS recipes_recipe_fts_update",
+    "DROP TABLE IF EXISTS recipes_recipe_fts",
+)
+
+# Вес названия выше веса описания, как 'A' и 'B' в PostgreSQL.
+SQLITE_RANK = "bm25(recipes_recipe_fts, 10.0, 1.0)"
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_index(connection):
+    """Создаёт полнотекстовый индекс рецептов.
+
+    На PostgreSQL это генерируемый столбец tsvector с русской морфологией
+    и GIN-индексом, на SQLite — таблица FTS5, которую ведут триггеры.
+    """
+    if connection.vendor == "postgresql":
+        _execute(connection, POSTGRES_INDEX)
+    elif connection.vendor == "sqlite":
+        _execute(connection, SQLITE_TABLE + SQLITE_TRIGGERS + SQLITE_REBUILD)
+
+
+def drop_search_index(connection):
+    if connection.vendor == "postgresql":
+        _execute(connection, POSTGRES_DROP_INDEX)
+    elif connection.vendor == "sqlite":
+        _execute(connection, SQLITE_DROP_INDEX)
+
+
+def ensure_search_index(connection):
+    """Восстанавливает триггеры FTS5, потерянные при пересоздании таблицы.
+
+    SQLite-бэкенд Django меняет схему через копирование таблицы, и
+    триггеры старой таблицы удаляются вместе с ней.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'table' AND name = 'recipes_recipe_fts'"
+        )
+        if not cursor.fetchone()[0]:
+            return
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE 'recipes_recipe_fts_%'"
+        )
+        if cursor.fetchone()[0] == len(SQLITE_TRIGGERS):
+            return
+    _execute(connection, SQLITE_TRIGGERS + SQLITE_REBUILD)
+
+
+def _stem(word):
+    stem = ENDING_RE.sub("", word.lower())
+    return stem if len(stem) >= MIN_STEM_LENGTH else word.lower()
+
+
+def _sqlite_match(query):
+    """Строит безопасное выражение MATCH: все основы запроса как префиксы."""
+    words = WORD_RE.findall(query)
+    return " ".join(f'"{_stem(word)}"*' for word in words)
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('russian', %s)"
+        return queryset.filter(
+            id__in=RawSQL(
+                "SELECT id FROM recipes_recipe "
+                f"WHERE search_vector @@ {tsquery}",
+                (query,),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank(recipes_recipe.search_vector, {tsquery})",
+                (query,),
+                output_field=FloatField(),
+            )
+        ).order_by("-search_rank", "-pub_date")
+
+    if vendor == "sqlite":
+        match = _sqlite_match(query)
+        if not match:
+            return queryset.none()
+        # Таблица индекса присоединяется, чтобы ранжировать через bm25
+        # (чем меньше значение, тем выше релевантность). Унарный плюс не
+        # даёт планировщику сделать FTS5 внутренним циклом: иначе без
+        # статистики он перебирает рецепты и проверяет MATCH для каждого.
+        return queryset.extra(
+            select={"search_rank": SQLITE_RANK},
+            tables=["recipes_recipe_fts"],
+            where=[
+                "recipes_recipe.id = +recipes_recipe_fts.rowid",
+                "recipes_recipe_fts MATCH %s",
+            ],
+            params=[match],
+        ).order_by("search_rank", "-pub_date")
+
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    )
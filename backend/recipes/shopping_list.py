@@ -0,0 +1,194 @@
+import contextvars
+from contextlib import contextmanager
+from itertools import islice
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+VERSION_KEY = "recipes:shopping_list_version:{}"
+
+_bulk_change = contextvars.ContextVar(
+    "shopping_list_bulk_change", default=False
+)
+
+
+def version(user_id):
+    """Версия списка покупок пользователя для ETag, без запросов в БД."""
+    return cache.get_or_set(
+        VERSION_KEY.format(user_id), lambda: uuid4().hex, None
+    )
+
+
+def _bump_versions(user_ids):
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: cache.set_many(
+        {VERSION_KEY.format(user_id): uuid4().hex for user_id in user_ids},
+        None,
+    ))
+
+
+def recipe_amounts(recipe_id):
+    """Состав рецепта: {ingredient_id: количество}."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id=recipe_id)
+        .values_list("ingredient_id", "amount")
+    )
+
+
+def apply_delta(user_ids, delta):
+    """Прибавляет delta {ingredient_id: количество} к спискам пользователей.
+
+    Отрицательные значения вычитаются, обнулившиеся позиции удаляются.
+    Строки пользователей блокируются, чтобы параллельные изменения одной
+    корзины не теряли слагаемые.
+    """
+    delta = {pk: amount for pk, amount in delta.items() if amount}
+    if not user_ids or not delta:
+        return
+    with transaction.atomic():
+        list(
+            User.objects.select_for_update().filter(pk__in=user_ids)
+            .order_by("pk").values_list("pk", flat=True)
+        )
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in ShoppingListItem.objects.filter(
+                user__in=user_ids, ingredient__in=delta
+            )
+        }
+        changed, created, emptied = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in delta.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        created.append(ShoppingListItem(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        ))
+                    continue
+                item.amount += amount
+                if item.amount > 0:
+                    changed.append(item)
+                else:
+                    emptied.append(item.pk)
+        if emptied:
+            ShoppingListItem.objects.filter(pk__in=emptied).delete()
+        ShoppingListItem.objects.bulk_update(changed, ["amount"])
+        ShoppingListItem.objects.bulk_create(created)
+        _bump_versions(user_ids)
+
+
+def add_recipe(user_id, recipe_id):
+    apply_delta([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_delta(
+        [user_id],
+        {pk: -amount for pk, amount in recipe_amounts(recipe_id).items()},
+    )
+
+
+@contextmanager
+def bulk_change():
+    """Блок, где состав рецептов меняется пачкой.
+
+    Разницу переносит в списки сам вызывающий (change_recipe), поэтому
+    построчные сигналы RecipeIngredient внутри блока её не дублируют.
+    """
+    token = _bulk_change.set(True)
+    try:
+        yield
+    finally:
+        _bulk_change.reset(token)
+
+
+def in_bulk_change():
+    return _bulk_change.get()
+
+
+def change_recipe(recipe_id, old_amounts, new_amounts):
+    """Переносит новый состав рецепта в списки всех, у кого он в корзине."""
+    user_ids = list(
+        ShoppingCart.objects.filter(recipe_id=recipe_id)
+        .values_list("user_id", flat=True)
+    )
+    delta = {
+        pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+        for pk in old_amounts.keys() | new_amounts.keys()
+    }
+    apply_delta(user_ids, delta)
+
+
+def expected_items(user_ids):
+    """Списки покупок, посчитанные заново по корзинам пользователей."""
+    rows = (
+        RecipeIngredient.objects
+        .filter(recipe__shoppingcarts__user__in=user_ids)
+        .values_list("recipe__shoppingcarts__user", "ingredient")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+    return {(user, ingredient): total for user, ingredient, total in rows}
+
+
+def stored_items(user_ids):
+    return {
+        (user, ingredient): amount
+        for user, ingredient, amount in ShoppingListItem.objects.filter(
+            user__in=user_ids
+        ).values_list("user", "ingredient", "amount")
+    }
+
+
+def user_batches():
+    """Id пользователей с корзиной или списком покупок, пачками."""
+    carts = ShoppingCart.objects.order_by().values_list("user_id", flat=True)
+    items = ShoppingListItem.objects.order_by().values_list(
+        "user_id", flat=True
+    )
+    user_ids = carts.union(items).order_by("user_id").iterator()
+    while batch := list(islice(user_ids, BATCH_SIZE)):
+        yield batch
+
+
+def find_inconsistent_users():
+    """Пользователи, чей сохранённый список расходится с корзиной."""
+    for user_ids in user_batches():
+        expected = expected_items(user_ids)
+        stored = stored_items(user_ids)
+        yield from sorted({
+            user
+            for user, ingredient in expected.keys() | stored.keys()
+            if expected.get((user, ingredient)) != stored.get(
+                (user, ingredient)
+            )
+        })
+
+
+def rebuild(user_ids):
+    """Пересчитывает списки покупок пользователей с нуля."""
+    with transaction.atomic():
+        ShoppingListItem.objects.filter(user__in=user_ids).delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user, ingredient_id=ingredient, amount=total
+                )
+                for (user, ingredient), total in expected_items(
+                    user_ids
+                ).items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        _bump_versions(user_ids)
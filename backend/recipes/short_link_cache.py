@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from . import short_links
+from .models import Recipe
+
+VERSION_KEY = "recipes:short_links_version"
+
+
+def lookup(link):
+    """id рецепта по короткой ссылке, новой или прежней, одним запросом."""
+    pk = short_links.decode(link)
+    matches = dict(
+        Recipe.objects.filter(Q(pk=pk) | Q(link=link))
+        .values_list("pk", "link")
+    )
+    # Вычисленный код главнее сохранённого: прежние коды были короче.
+    if pk in matches:
+        return pk
+    return next(iter(matches), None)
+
+
+class ShortLinkCache:
+    """LRU-кеш «короткая ссылка -> id рецепта» в памяти процесса.
+
+    Неизвестные коды тоже запоминаются (как None), чтобы перебор
+    ссылок не доходил до базы. Коды не меняются, поэтому сбрасывать
+    кеш нужно только при удалении рецептов: версия в общем кеше
+    Django сообщает об этом остальным процессам. Создание рецепта
+    кеш не сбрасывает — код ещё не созданного рецепта никто не знает.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _sync(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def resolve(self, link):
+        version = cache.get_or_set(VERSION_KEY, lambda: uuid4().hex, None)
+        with self._lock:
+            self._sync(version)
+            if link in self._entries:
+                self._entries.move_to_end(link)
+                self.hits += 1
+                return self._entries[link]
+            self.misses += 1
+        pk = lookup(link)
+        with self._lock:
+            self._sync(version)
+            self._entries[link] = pk
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return pk
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, uuid4().hex, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+short_link_cache = ShortLinkCache(settings.SHORT_LINK_CACHE_MAX_ENTRIES)
@@ -0,0 +1,94 @@
+import hashlib
+import string
+from functools import lru_cache
+
+from django.conf import settings
+from foodgram.constants import LENGTH_SHORT_LINK
+
+ALPHABET = string.ascii_letters
+BASE = len(ALPHABET)
+INDEX = {char: position for position, char in enumerate(ALPHABET)}
+ROUNDS = 4
+
+
+@lru_cache(maxsize=None)
+def _domain(length):
+    """Параметры перестановки для кодов заданной длины.
+
+    Сеть Фейстеля работает на 2 * half битах; значения за пределами
+    BASE ** length пропускаются повторным шифрованием (cycle walking),
+    поэтому перестановка остаётся биекцией на [0, BASE ** length).
+    """
+    size = BASE ** length
+    half = (size.bit_length() + 1) // 2
+    return size, half, (1 << half) - 1
+
+
+def _round(length, number, value, mask):
+    digest = hashlib.blake2b(
+        f"{length}:{number}:{value}".encode(),
+        key=settings.SHORT_LINK_KEY.encode()[:64],
+        digest_size=8,
+    ).digest()
+    return int.from_bytes(digest, "big") & mask
+
+
+def _feistel(length, value, rounds):
+    _, half, mask = _domain(length)
+    left, right = value >> half, value & mask
+    for number in rounds:
+        left, right = right, left ^ _round(length, number, right, mask)
+    return left << half | right
+
+
+def _unfeistel(length, value, rounds):
+    _, half, mask = _domain(length)
+    left, right = value >> half, value & mask
+    for number in reversed(rounds):
+        left, right = right ^ _round(length, number, left, mask), left
+    return left << half | right
+
+
+def _permute(length, value, step):
+    size = _domain(length)[0]
+    value = step(length, value, range(ROUNDS))
+    while value >= size:
+        value = step(length, value, range(ROUNDS))
+    return value
+
+
+def _length(pk):
+    length = LENGTH_SHORT_LINK
+    while pk >= BASE ** length:
+        length += 1
+    return length
+
+
+def encode(pk):
+    """Короткий код рецепта: ключевая перестановка id в base-52.
+
+    Код однозначно восстанавливается из id без запросов к базе,
+    а без ключа SHORT_LINK_KEY соседние id дают несвязанные коды.
+    """
+    length = _length(pk)
+    value = _permute(length, pk, _feistel)
+    chars = []
+    for _ in range(length):
+        value, position = divmod(value, BASE)
+        chars.append(ALPHABET[position])
+    return "".join(reversed(chars))
+
+
+def decode(code):
+    """id рецепта по короткому коду или None, если код не выдавался."""
+    if len(code) < LENGTH_SHORT_LINK:
+        return None
+    value = 0
+    for char in code:
+        if char not in INDEX:
+            return None
+        value = value * BASE + INDEX[char]
+    pk = _permute(len(code), value, _unfeistel)
+    if pk == 0 or _length(pk) != len(code):
+        return None
+    return pk
@@ -0,0 +1,188 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from users.models import Subscription
+
+from . import image_variants, media, relations, shopping_list
+from .catalog import ingredient_catalog
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart)
+from .search import ensure_search_index
+from .short_link_cache import short_link_cache
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_catalog(**kwargs):
+    ingredient_catalog.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def enqueue_recipe_image(instance, **kwargs):
+    transaction.on_commit(
+        lambda: image_variants.enqueue(instance, "image")
+    )
+
+
+@receiver(post_save, sender=User)
+def enqueue_avatar(instance, **kwargs):
+    transaction.on_commit(
+        lambda: image_variants.enqueue(instance, "avatar")
+    )
+
+
+# Счётчики ссылок на файлы хранилища: объект помнит свои ссылки
+# с момента загрузки, а после сохранения в счётчики идёт разница.
+@receiver(post_init, sender=Recipe)
+@receiver(post_init, sender=User)
+def remember_media(instance, **kwargs):
+    media.remember(instance)
+
+
+@receiver(pre_save, sender=Recipe)
+@receiver(pre_save, sender=User)
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def load_media(instance, raw=False, **kwargs):
+    if not raw:
+        media.load(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def count_media(instance, created, raw, **kwargs):
+    # loaddata не знает прежних ссылок: после него нужен
+    # collect_media --recount.
+    if not raw:
+        media.update(instance, created)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def release_media(instance, **kwargs):
+    media.release(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_short_links(**kwargs):
+    transaction.on_commit(short_link_cache.invalidate)
+
+
+@receiver(post_migrate)
+def restore_search_index(sender, using, **kwargs):
+    if sender.name == "recipes":
+        ensure_search_index(connections[using])
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+# pre_delete: при каскадном удалении рецепта его состав ещё на месте.
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+# Правка состава по одной строке (админка) переносится в списки всех,
+# у кого рецепт в корзине. Сериализатор меняет состав пачкой и переносит
+# разницу сам, внутри shopping_list.bulk_change().
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_recipe_ingredient(instance, raw=False, **kwargs):
+    instance._stored_row = None
+    if raw or instance.pk is None or shopping_list.in_bulk_change():
+        return
+    instance._stored_row = RecipeIngredient.objects.filter(
+        pk=instance.pk
+    ).values_list("recipe_id", "ingredient_id", "amount").first()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def change_shopping_lists(instance, raw=False, **kwargs):
+    if raw or shopping_list.in_bulk_change():
+        return
+    new = {instance.ingredient_id: instance.amount}
+    stored = getattr(instance, "_stored_row", None)
+    if stored is None:
+        shopping_list.change_recipe(instance.recipe_id, {}, new)
+        return
+    recipe_id, ingredient_id, amount = stored
+    if recipe_id == instance.recipe_id:
+        shopping_list.change_recipe(recipe_id, {ingredient_id: amount}, new)
+    else:
+        shopping_list.change_recipe(recipe_id, {ingredient_id: amount}, {})
+        shopping_list.change_recipe(instance.recipe_id, {}, new)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_shopping_lists(instance, origin=None, **kwargs):
+    # Каскад от удаления рецепта уже учёл сигнал корзины, а от удаления
+    # ингредиента позиции списков удаляются тем же каскадом.
+    origin_model = (
+        origin.model if isinstance(origin, QuerySet) else type(origin)
+    )
+    if origin_model is not RecipeIngredient or shopping_list.in_bulk_change():
+        return
+    shopping_list.change_recipe(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+# Счётчики меняются одним UPDATE с F(), без чтения значения в Python,
+# поэтому параллельные запросы не затирают друг друга.
+@receiver(post_save, sender=Favorite)
+def count_new_favorite(instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F("favorites_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def count_removed_favorite(instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, favorites_count__gt=0
+    ).update(favorites_count=F("favorites_count") - 1)
+
+
+@receiver(post_save, sender=Recipe)
+def count_new_recipe(instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def count_removed_recipe(instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id, recipes_count__gt=0
+    ).update(recipes_count=F("recipes_count") - 1)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_user_relations(instance, **kwargs):
+    relations.invalidate(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def invalidate_subscriber_relations(instance, **kwargs):
+    relations.invalidate(instance.subscriber_id)
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, created, update_fields=None, **kwargs):
+    # Рецепт показывает имя и аватар автора, поэтому его версия
+    # меняется вместе с профилем. Вход (last_login) не в счёт.
+    if created or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    Recipe.objects.filter(author=instance).update(updated_at=timezone.now())
@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from .models import StoredFile
+
+CONTENT_DIR = "content"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — SHA-256 его содержимого.
+
+    Одинаковые картинки, откуда бы их ни загрузили, хранятся один раз:
+    повторная загрузка только отмечает время в StoredFile. Содержимое
+    файла по имени никогда не меняется, поэтому nginx отдаёт
+    content/ с бессрочным кешированием. Удаляет файлы только сборщик
+    мусора (recipes.media), когда на них не осталось ссылок.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = f"{CONTENT_DIR}/{digest[:2]}/{digest}{extension}"
+        # Сначала строка, потом файл: сборщик мусора удаляет их в том
+        # же порядке под блокировкой строки и не заберёт файл из-под
+        # параллельной загрузки.
+        StoredFile.objects.bulk_create(
+            [StoredFile(name=name, used_at=timezone.now())],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["used_at"],
+        )
+        if not self.exists(name):
+            saved = self._save(name, content)
+            if saved != name:
+                # Тот же файл успел записать параллельный запрос.
+                self.delete(saved)
+        return name
@@ -0,0 +1,364 @@
+"""Перенос рецептов между окружениями в JSON Lines.
+
+Одна строка — одна запись {"type": ..., "id": ..., ...}. Записи идут
+разделами в порядке SECTIONS, внутри раздела — по возрастанию id:
+по последней строке файла можно продолжить прерванную выгрузку.
+Пользователи связываются по username, ингредиенты — по названию и единице,
+рецепты сохраняют свои id, чтобы не менялись короткие ссылки. Если id
+в базе занят другим рецептом, рецепт получает новый id, а избранное
+и корзины переводятся на него по карте id (см. import_recipes).
+Картинки передаются именами файлов в хранилище, сами файлы
+переносятся отдельно.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+from users.models import Subscription
+
+from . import bulk
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+USER_FIELDS = (
+    "username", "email", "first_name", "last_name", "password", "avatar",
+    "is_active", "date_joined",
+)
+RECIPE_FIELDS = (
+    "name", "text", "cooking_time", "image", "link", "pub_date",
+    "updated_at",
+)
+
+
+def _keyset(queryset, after_id):
+    """Строки queryset пачками по id, без OFFSET и долгого курсора."""
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=after_id).order_by("pk")[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1]["id"]
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def export_users(after_id):
+    queryset = User.objects.values("id", *USER_FIELDS)
+    for batch in _keyset(queryset, after_id):
+        for row in batch:
+            yield {key: _value(value) for key, value in row.items()}
+
+
+def export_recipes(after_id):
+    queryset = Recipe.objects.values(
+        "id", "author__username", *RECIPE_FIELDS
+    )
+    for batch in _keyset(queryset, after_id):
+        ingredients = {}
+        for recipe_id, name, unit, amount in (
+            RecipeIngredient.objects.filter(
+                recipe_id__in=[row["id"] for row in batch]
+            ).order_by("pk").values_list(
+                "recipe_id", "ingredient__name",
+                "ingredient__measurement_unit", "amount",
+            )
+        ):
+            ingredients.setdefault(recipe_id, []).append([name, unit, amount])
+        for row in batch:
+            record = {key: _value(value) for key, value in row.items()}
+            record["author"] = record.pop("author__username")
+            record["ingredients"] = ingredients.get(row["id"], [])
+            yield record
+
+
+def _export_relation(model, user_field, target_field):
+    def export(after_id):
+        queryset = model.objects.values_list(
+            "id", f"{user_field}__username", target_field
+        )
+        while batch := list(
+            queryset.filter(pk__gt=after_id).order_by("pk")[:BATCH_SIZE]
+        ):
+            for pk, username, target in batch:
+                yield {"id": pk, "user": username, "target": target}
+            after_id = batch[-1][0]
+    return export
+
+
+# Раздел: (тип записи, выгрузка с id больше заданного).
+SECTIONS = (
+    ("user", export_users),
+    ("recipe", export_recipes),
+    ("favorite", _export_relation(Favorite, "user", "recipe_id")),
+    ("cart", _export_relation(ShoppingCart, "user", "recipe_id")),
+    (
+        "subscription",
+        _export_relation(Subscription, "subscriber", "author__username"),
+    ),
+)
+
+
+def export(after=None):
+    """Записи всех разделов; after = (тип, id) последней выгруженной."""
+    types = [kind for kind, _ in SECTIONS]
+    start = types.index(after[0]) if after else 0
+    for index, (kind, rows) in enumerate(SECTIONS[start:], start):
+        after_id = after[1] if after and index == start else 0
+        for row in rows(after_id):
+            yield {"type": kind, **row}
+
+
+def _user_ids(usernames):
+    return dict(
+        User.objects.filter(username__in=set(usernames))
+        .values_list("username", "pk")
+    )
+
+
+def import_users(records, recipe_ids):
+    existing = _user_ids(record["username"] for record in records)
+    bulk.insert(User, [
+        User(
+            **{field: record.get(field) or "" for field in USER_FIELDS
+               if field not in ("is_active", "date_joined")},
+            is_active=record.get("is_active", True),
+            date_joined=parse_datetime(record["date_joined"]),
+        )
+        for record in records
+        if record["username"] not in existing
+    ])
+    return set()
+
+
+def _ingredient_ids(records):
+    """{(название, единица): id}; недостающие ингредиенты создаются.
+
+    Название уникально само по себе, поэтому ингредиент, который
+    в базе записан с другой единицей, создать нельзя: такой пары
+    в результате нет, и рецепт с ним пропускается вызывающим.
+    Справочник в памяти сбрасывает bulk.refresh_derived.
+    """
+    pairs = {
+        (name, unit)
+        for record in records
+        for name, unit, _ in record["ingredients"]
+    }
+
+    def existing():
+        return {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in={name for name, _ in pairs}
+            ).values_list("pk", "name", "measurement_unit")
+        }
+
+    found = existing()
+    missing = [
+        Ingredient(name=name, measurement_unit=unit)
+        for name, unit in pairs - found.keys()
+    ]
+    if missing:
+        Ingredient.objects.bulk_create(missing, ignore_conflicts=True)
+        found = existing()
+    return found
+
+
+class RecipeIds(dict):
+    """Карта {id в файле: id в базе} для рецептов, сменивших id.
+
+    last_source_id — наибольший id рецепта в файле: новые id выдаются
+    после него, чтобы не занять id рецептов из следующих пачек.
+    """
+
+    def __init__(self, *args, last_source_id=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_source_id = last_source_id
+
+
+def _identity(author, name, pub_date):
+    """Признаки того же рецепта в другой базе: id совпадать не обязан."""
+    return author, name, pub_date
+
+
+def _build_recipe(record, author_id, pk):
+    recipe = Recipe(
+        id=pk,
+        author_id=author_id,
+        **{field: record[field] for field in RECIPE_FIELDS},
+    )
+    recipe.pub_date = parse_datetime(record["pub_date"])
+    recipe.updated_at = parse_datetime(record["updated_at"])
+    return recipe
+
+
+def import_recipes(records, recipe_ids):
+    """Загружает рецепты; recipe_ids — карта {id в файле: id в базе}.
+
+    В карту (RecipeIds) попадают рецепты, чей id в базе занят другим
+    рецептом (им выдаётся новый id), и пропущенные рецепты (None),
+    чтобы связи с ними не легли на чужие рецепты. Пропускаются рецепты
+    неизвестных авторов, рецепты с ингредиентом, который в базе записан
+    с другой единицей, и строки, которые вставка отбросила из-за
+    конфликта. Рецепт с тем же id и теми же автором, названием и датой
+    считается уже загруженным. Прежняя ссылка (link), занятая в базе
+    другим рецептом, не переносится.
+    """
+    records = [record for record in records if record["id"] not in recipe_ids]
+    identities = {
+        record["id"]: _identity(
+            record["author"], record["name"],
+            parse_datetime(record["pub_date"]),
+        )
+        for record in records
+    }
+    stored = {
+        pk: _identity(author, name, pub_date)
+        for pk, author, name, pub_date in Recipe.objects.filter(
+            pk__in=list(identities)
+        ).values_list("pk", "author__username", "name", "pub_date")
+    }
+    fresh, conflicting = [], []
+    for record in records:
+        if record["id"] not in stored:
+            fresh.append(record)
+        elif stored[record["id"]] != identities[record["id"]]:
+            conflicting.append(record)
+    moved = []
+    if conflicting:
+        # Возможно, рецепт уже получил новый id в прерванном импорте.
+        existing = {
+            _identity(author, name, pub_date): pk
+            for pk, author, name, pub_date in Recipe.objects.filter(
+                author__username__in={r["author"] for r in conflicting},
+                name__in={r["name"] for r in conflicting},
+            ).values_list("pk", "author__username", "name", "pub_date")
+        }
+        for record in conflicting:
+            pk = existing.get(identities[record["id"]])
+            if pk is None:
+                moved.append(record)
+            else:
+                recipe_ids[record["id"]] = pk
+    authors = _user_ids(record["author"] for record in fresh + moved)
+    for record in fresh + moved:
+        if record["author"] not in authors:
+            recipe_ids[record["id"]] = None
+    fresh = [record for record in fresh if record["id"] not in recipe_ids]
+    moved = [record for record in moved if record["id"] not in recipe_ids]
+    ingredients = _ingredient_ids(fresh + moved)
+    for record in fresh + moved:
+        if any(
+            (name, unit) not in ingredients
+            for name, unit, _ in record["ingredients"]
+        ):
+            recipe_ids[record["id"]] = None
+    fresh = [record for record in fresh if record["id"] not in recipe_ids]
+    moved = [record for record in moved if record["id"] not in recipe_ids]
+    if moved:
+        last_id = max(
+            recipe_ids.last_source_id,
+            Recipe.objects.aggregate(last=Max("pk"))["last"] or 0,
+        )
+        for new_id, record in enumerate(moved, last_id + 1):
+            recipe_ids[record["id"]] = new_id
+    records = fresh + moved
+    taken_links = set(
+        Recipe.objects.filter(
+            link__in={record["link"] for record in records} - {None}
+        ).values_list("link", flat=True)
+    )
+    recipes = []
+    for record in records:
+        recipe = _build_recipe(
+            record, authors[record["author"]],
+            recipe_ids.get(record["id"], record["id"]),
+        )
+        if recipe.link in taken_links:
+            recipe.link = None
+        recipes.append(recipe)
+    with bulk.keep_timestamps(Recipe):
+        bulk.insert(Recipe, recipes)
+    # Вставка молча пропускает конфликтующие строки: проверяем, что
+    # под выданными id лежат именно эти рецепты.
+    written = {
+        pk: _identity(author, name, pub_date)
+        for pk, author, name, pub_date in Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]
+        ).values_list("pk", "author__username", "name", "pub_date")
+    }
+    for record, recipe in zip(records, recipes):
+        if written.get(recipe.pk) != identities[record["id"]]:
+            recipe_ids[record["id"]] = None
+    records = [
+        record for record in records
+        if recipe_ids.get(record["id"], record["id"]) is not None
+    ]
+    bulk.insert(RecipeIngredient, [
+        RecipeIngredient(
+            recipe_id=recipe_ids.get(record["id"], record["id"]),
+            ingredient_id=ingredients[(name, unit)],
+            amount=amount,
+        )
+        for record in records
+        for name, unit, amount in record["ingredients"]
+    ])
+    return set()
+
+
+def _import_relation(model, user_field, target_field, target_of):
+    def import_records(records, recipe_ids):
+        users = _user_ids(record["user"] for record in records)
+        targets = target_of(records, recipe_ids)
+        objects = [
+            model(**{
+                f"{user_field}_id": users[record["user"]],
+                f"{target_field}_id": targets[record["target"]],
+            })
+            for record in records
+            if record["user"] in users and record["target"] in targets
+        ]
+        bulk.insert(model, objects)
+        return {getattr(obj, f"{user_field}_id") for obj in objects}
+    return import_records
+
+
+def _recipes(records, recipe_ids):
+    """{id в файле: id в базе} для рецептов, которые есть в базе."""
+    targets = {
+        record["target"]: recipe_ids.get(record["target"], record["target"])
+        for record in records
+    }
+    pks = set(
+        Recipe.objects.filter(pk__in=set(targets.values()) - {None})
+        .values_list("pk", flat=True)
+    )
+    return {source: pk for source, pk in targets.items() if pk in pks}
+
+
+def _authors(records, recipe_ids):
+    return _user_ids(record["target"] for record in records)
+
+
+# Тип записи -> загрузка пачки; возвращает id пользователей, чьи
+# связи (избранное, корзина, подписки) изменились.
+IMPORTERS = {
+    "user": import_users,
+    "recipe": import_recipes,
+    "favorite": _import_relation(Favorite, "user", "recipe", _recipes),
+    "cart": _import_relation(ShoppingCart, "user", "recipe", _recipes),
+    "subscription": _import_relation(
+        Subscription, "subscriber", "author", _authors
+    ),
+}
+
+
+def import_batch(kind, records, recipe_ids):
+    with transaction.atomic():
+        return IMPORTERS[kind](records, recipe_ids)
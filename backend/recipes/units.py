@@ -0,0 +1,83 @@
+from decimal import Decimal
+from itertools import islice
+
+from .catalog import normalize
+
+MASS = "mass"
+VOLUME = "volume"
+
+# Единица -> (величина, множитель к базовой). База — наименьшая единица
+# величины, поэтому целые количества складываются без потери точности.
+UNITS = {
+    "мг": (MASS, 1),
+    "г": (MASS, 1000),
+    "кг": (MASS, 1000 * 1000),
+    "мл": (VOLUME, 1),
+    "л": (VOLUME, 1000),
+}
+# Единицы вывода от крупной к мелкой: берётся первая, в которой
+# количество не меньше единицы.
+DISPLAY_UNITS = {
+    MASS: ("кг", "г", "мг"),
+    VOLUME: ("л", "мл"),
+}
+BATCH_SIZE = 2000
+
+
+def _unit_key(unit):
+    return unit.strip().lower()
+
+
+def to_base(amount, unit):
+    """Переводит количество в базовую единицу величины.
+
+    Возвращает (величина, количество); для несоизмеримых единиц
+    (шт., ч. л., щепотка) величиной служит сама единица.
+    """
+    dimension, factor = UNITS.get(_unit_key(unit), (None, 1))
+    if dimension is None:
+        return unit, amount
+    return dimension, amount * factor
+
+
+def humanize(dimension, amount):
+    """Подбирает удобную единицу: 1500 г -> (1,5, кг)."""
+    if dimension not in DISPLAY_UNITS:
+        return amount, dimension
+    units = DISPLAY_UNITS[dimension]
+    for unit in units:
+        factor = UNITS[unit][1]
+        if amount >= factor:
+            break
+    value = (Decimal(amount) / factor).quantize(Decimal("0.001"))
+    return value.normalize() if value % 1 else int(value), unit
+
+
+def format_amount(value):
+    text = f"{value:f}" if isinstance(value, Decimal) else str(value)
+    return text.replace(".", ",")
+
+
+def aggregate(rows):
+    """Суммирует строки списка покупок с учётом единиц за один проход.
+
+    rows — словари name/unit/total в любом порядке. Ингредиенты, чьи
+    названия совпадают без учёта регистра и ё, складываются, если их
+    единицы соизмеримы (г и кг, мл и л). Строки читаются пачками, в
+    памяти держится только по одному итогу на ингредиент.
+    Возвращает строки name/unit/total, упорядоченные по названию.
+    """
+    totals = {}
+    rows = iter(rows)
+    while batch := list(islice(rows, BATCH_SIZE)):
+        for row in batch:
+            dimension, amount = to_base(row["total"], row["unit"])
+            key = (normalize(row["name"]), dimension)
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [row["name"], amount]
+            else:
+                total[1] += amount
+    for (_, dimension), (name, amount) in sorted(totals.items()):
+        value, unit = humanize(dimension, amount)
+        yield {"name": name, "unit": unit, "total": format_amount(value)}
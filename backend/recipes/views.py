@@ -1,8 +1,49 @@
-from django.shortcuts import get_object_or_404, redirect
-from recipes.models import Recipe
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_cache_control
+from foodgram.constants import SHORT_LINK_REDIRECT_MAX_AGE
+from recipes.link_clicks import click_buffer
+from recipes.short_link_cache import short_link_cache
 
 
 def recipe_short_redirect_view(request, link):
     """Редирект по короткой ссылке на рецепт."""
-    recipe = get_object_or_404(Recipe, link=link)
-    return redirect(f"/recipes/{recipe.id}/")
+    pk = short_link_cache.resolve(link)
+    if pk is None:
+        raise Http404("Рецепт не найден.")
+    response = redirect(f"/recipes/{pk}/")
+    # Ссылка всегда ведёт на один и тот же рецепт, поэтому редирект
+    # кешируется. В общем кеше nginx — только когда переходы считает
+    # зеркальный запрос: иначе ответы из кеша не дошли бы до счётчика.
+    if settings.SHORT_LINK_CLICKS_FROM_PROXY:
+        patch_cache_control(
+            response, public=True, max_age=SHORT_LINK_REDIRECT_MAX_AGE
+        )
+    else:
+        click_buffer.record(pk)
+        patch_cache_control(
+            response, private=True, max_age=SHORT_LINK_REDIRECT_MAX_AGE
+        )
+    return response
+
+
+def short_link_click_view(request):
+    """Считает переход по короткой ссылке из зеркального запроса nginx.
+
+    nginx отправляет его на каждый запрос /s/, в том числе отданный
+    из своего кеша; исходный адрес — в заголовке X-Original-URI.
+    """
+    uri = request.headers.get("X-Original-URI", "")
+    try:
+        match = resolve(urlsplit(uri).path)
+    except Resolver404:
+        match = None
+    if match is not None and match.url_name == "recipe_short_redirect_view":
+        pk = short_link_cache.resolve(match.kwargs["link"])
+        if pk is not None:
+            click_buffer.record(pk)
+    return HttpResponse(status=204)
@@ -20,20 +20,16 @@ class CustomUserAdmin(BaseUserAdmin):
     search_fields = ("username", "email")
     search_help_text = "Поиск по нику или email"
     list_filter = ("is_staff", "is_active")
+    readonly_fields = ("recipes_count", "subscribers_count")
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ("Статистика", {"fields": readonly_fields}),
+    )
     ordering = ("id",)
 
     @admin.display(description="Блокировка")
     def is_active_display(self, obj):
         return obj.is_active
 
-    @admin.display(description="Рецептов")
-    def recipes_count(self, obj):
-        return obj.recipes.count()
-
-    @admin.display(description="Подписчиков")
-    def subscribers_count(self, obj):
-        return obj.followers.count()
-
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -1,10 +1,35 @@
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
-from django.db import models
+from django.db import models, transaction
 from foodgram.constants import MAX_LENGTH_EMAIL, MAX_LENGTH_USERNAME
 
 
-class User(AbstractUser):
+class CountedModel(models.Model):
+    """Модель со счётчиками, которые ведут сигналы UPDATE с F().
+
+    Обычное сохранение загруженного объекта не пишет поля из
+    counter_fields: значения в памяти могли устареть и затёрли бы
+    изменения из других запросов.
+    """
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountedModel, AbstractUser):
     """Модель пользователя."""
 
     username = models.CharField(
@@ -36,6 +61,21 @@ class User(AbstractUser):
         null=True,
         verbose_name="Аватар"
     )
+    # Уменьшенные копии аватара, которые готовит process_image_jobs.
+    avatar_variants = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name="Варианты аватара",
+    )
+
+    # Счётчики ведут сигналы, сверяет команда reconcile_counters.
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Рецептов"
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Подписчиков"
+    )
+
+    counter_fields = ("recipes_count", "subscribers_count")
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name"]
@@ -82,3 +122,8 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.subscriber} подписан на {self.author}"
+
+    def save(self, *args, **kwargs):
+        # Счётчик подписчиков меняется сигналом в той же транзакции.
+        with transaction.atomic():
+            super().save(*args, **kwargs)